@@ -0,0 +1,155 @@
+"""
+Micro-benchmark of the lap time processing in `driver_performance.py`.
+
+Compares the previous per-row `.apply` implementation against the vectorized
+helpers in `src/laps.py` on synthetic lap records, the lap summary against
+its lookup in the lap time aggregates of `src/history.py`, and the pace
+analysis of `src/pace.py` against the same computations written in that style.
+
+    python benchmarks/bench_laps.py --laps 50000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import timeit
+
+import pandas as pd
+import streamlit as st
+
+from contextlib import closing
+from streamlit.runtime.secrets import Secrets
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+import frames
+import history
+import laps
+import pace
+
+
+def make_records(count, seed=1):
+    rnd = random.Random(seed)
+    circuit = {"circuitId": 1, "name": "Silverstone Circuit", "location": "Silverstone", "country": "UK"}
+    records = []
+    for i in range(count):
+        milliseconds = rnd.randint(85000, 125000)
+        race = {"raceId": 1000 + i // 60, "year": 1996 + i // 60 % 28, "round": 10, "circuitId": 1, "circuit": circuit}
+        records.append({
+            "raceId": race["raceId"],
+            "driverId": 1,
+            "lap": i % 60 + 1,
+            "position": rnd.randint(1, 20),
+            "time": laps.format_time(milliseconds),
+            "milliseconds": milliseconds,
+            "race": race,
+        })
+    return records
+
+
+def make_store(records, cache_dir):
+    """
+    Stores the records and builds their aggregates in a lap store in `cache_dir`, as a sync would.
+    """
+    st.secrets = Secrets([])
+    st.secrets._secrets = {"cache_dir": cache_dir}
+    with closing(history._connect()) as connection, connection:
+        history._insert(connection, records)
+        history._update_stats(connection, 0)
+
+
+def format_time(milliseconds):
+    minutes = milliseconds // 60000
+    seconds = (milliseconds % 60000) // 1000
+    millis = milliseconds % 1000
+    return f"{int(minutes)}:{int(seconds):02d}.{int(millis):03d}"
+
+
+# Previous implementation, one function per stage
+def flatten_per_row(records):
+    df = pd.DataFrame(records)
+    df["circuit"] = df["race"].apply(lambda x: x["circuit"]["name"])
+    df["race_year"] = df["race"].apply(lambda x: x["year"])
+    df["race_round"] = df["race"].apply(lambda x: x["round"])
+    return df
+
+
+def timings_per_row(df):
+    fastest = df[df["time"] == df["time"].min()].iloc[0]
+    time_td = pd.to_timedelta(df["time"].apply(lambda x: "0:" + x if len(x.split(':')) == 2 else x))
+    return fastest, time_td.mean()
+
+
+def format_per_row(df):
+    formatted = df["milliseconds"].apply(format_time)
+    chart_step = 5000
+    tickvals = [i * chart_step for i in range((df["milliseconds"].max() // chart_step) + 1)]
+    ticktext = [format_time(i * chart_step) for i in range((df["milliseconds"].max() // chart_step) + 1)]
+    return formatted, tickvals, ticktext
+
+
+def pace_per_row(df):
+    races = df.groupby("raceId")["milliseconds"]
+    median = races.transform("median")
+    sigma = (df["milliseconds"] - median).abs().groupby(df["raceId"]).transform("median") * pace.MAD_SCALE
+    slow = df.assign(median=median, sigma=sigma).apply(
+        lambda row: row["milliseconds"] > row["median"] + max(pace.OUTLIER_Z * row["sigma"], pace.MIN_OUTLIER_GAP * row["median"]),
+        axis=1,
+    )
+    clean = df["milliseconds"].where(~slow)
+    rolling = clean.groupby(df["raceId"]).transform(lambda laps: laps.rolling(pace.ROLLING_WINDOW, min_periods=1).mean())
+    delta = (df["milliseconds"] / median - 1) * 100
+    histogram = delta[~slow].groupby(df["race.year"]).apply(lambda deltas: deltas.value_counts(bins=50))
+    return slow, rolling, histogram
+
+
+# Vectorized implementation
+def flatten_vectorized(records):
+    return frames.flatten(records)
+
+
+def timings_vectorized(df):
+    return history.get_lap_summary(1, 1)
+
+
+def format_vectorized(df):
+    return laps.format_times(df["milliseconds"]), laps.time_ticks(df["milliseconds"].max())
+
+
+def pace_vectorized(df):
+    return pace.analyze(df["raceId"].to_numpy(), df["race.year"].to_numpy(), df["milliseconds"].to_numpy())
+
+
+def best_of(func, repeat):
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--laps", type=int, default=50000, help="Number of synthetic laps")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per implementation, the best one is reported")
+    args = parser.parse_args()
+
+    records = make_records(args.laps)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        make_store(records, cache_dir)
+        old_df = flatten_per_row(records)
+        new_df = flatten_vectorized(records)
+        assert (format_per_row(old_df)[0].to_numpy() == format_vectorized(new_df)[0]).all()
+        assert timings_vectorized(new_df)["fastest"] == old_df["milliseconds"].min()
+
+        stages = [
+            ("flatten", lambda: flatten_per_row(records), lambda: flatten_vectorized(records)),
+            ("fastest/mean lap", lambda: timings_per_row(old_df), lambda: timings_vectorized(new_df)),
+            ("format times + ticks", lambda: format_per_row(old_df), lambda: format_vectorized(new_df)),
+            ("pace analysis", lambda: pace_per_row(new_df), lambda: pace_vectorized(new_df)),
+        ]
+        print(f"{args.laps:,} laps, best of {args.repeat}")
+        print(f"  {'stage':<22} {'per-row':>10} {'vectorized':>11} {'speedup':>8}")
+        for name, old, new in stages:
+            old_seconds, new_seconds = best_of(old, args.repeat), best_of(new, args.repeat)
+            print(f"  {name:<22} {old_seconds * 1000:>8.1f}ms {new_seconds * 1000:>9.1f}ms {old_seconds / new_seconds:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""
+Load test of the dashboard: runs many simulated user sessions at the same
+time in one process, like the sessions of a single Streamlit server, against
+a local fake vps-rest-api.
+
+Every session browses the pages and runs the form flows of `bench_pages.py`
+in its own random order:
+
+    python benchmarks/bench_load.py --sessions 20 --rounds 3 --latency 50 --json load.json
+
+A single session first runs every scenario once to import the modules and
+fill the caches, unless `--no-warm-up` is passed. The load that follows is
+then measured: the p50/p95/p99 latency of the page reruns, overall and per
+page, the requests served by the API per endpoint and the growth of the
+process' resident memory.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from unittest.mock import MagicMock
+from urllib import parse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+import bench_pages
+import fake_api
+import streamlit as st
+
+from streamlit import source_util
+from streamlit.runtime import Runtime
+from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+from streamlit.runtime.media_file_manager import MediaFileManager
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+from streamlit.runtime.pages_manager import PagesManager
+from streamlit.runtime.secrets import Secrets
+from streamlit.testing.v1 import AppTest
+from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+from streamlit.testing.v1.util import patch_config_options
+
+
+##############################
+# Concurrent sessions
+##############################
+
+class SessionTest(AppTest):
+    """
+    AppTest whose runs leave the process-wide runtime and secrets alone, they
+    are set up once by `Server` so that sessions can run in parallel threads.
+    """
+
+    def _run(self, widget_state=None, timeout=None):
+        runner = LocalScriptRunner(
+            self._script_path,
+            self.session_state,
+            PagesManager(self._script_path, setup_watcher=False),
+            args=self.args,
+            kwargs=self.kwargs,
+        )
+        self._tree = runner.run(widget_state, self.query_params, timeout or self.default_timeout, self._page_hash)
+        self._tree._runner = self
+        self.query_params = parse.parse_qs(runner.event_data[-1]["client_state"].query_string)
+        return self
+
+
+class Server:
+    """
+    Sets up the runtime and secrets shared by every session, as a Streamlit server would.
+    """
+
+    def __init__(self, secrets):
+        self.secrets = secrets
+
+    def __enter__(self):
+        runtime = MagicMock(spec=Runtime)
+        runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+        runtime.cache_storage_manager = MemoryCacheStorageManager()
+        Runtime._instance = runtime
+        source_util._cached_pages = None
+        self._saved_secrets = st.secrets
+        st.secrets = Secrets([])
+        st.secrets._secrets = self.secrets
+        self._config = patch_config_options({"global.appTest": True})
+        self._config.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        self._config.__exit__(*exc)
+        st.secrets = self._saved_secrets
+        Runtime._instance = None
+
+
+def session(number, scenarios, rounds, timeout, seed, reruns, errors):
+    """
+    Runs every scenario `rounds` times in a random order, in a single session
+    switching pages like a user would. Appends `(page, seconds)` for every
+    rerun to `reruns` and the failures to `errors`.
+    """
+    rnd = random.Random(seed + number)
+    at = SessionTest(os.path.join(ROOT, "src", "streamlit_app.py"), default_timeout=timeout)
+    for _ in range(rounds):
+        for name, page, interaction in rnd.sample(scenarios, len(scenarios)):
+            try:
+                at.switch_page(page)
+                steps = [None] + ([interaction] if interaction else [])
+                for step in steps:
+                    if step:
+                        step(at)
+                    start = time.perf_counter()
+                    at.run()
+                    reruns.append((page, time.perf_counter() - start))
+                if at.exception:
+                    errors.append(f"{name}: {at.exception[0].value}")
+            except Exception as error:
+                errors.append(f"{name}: {type(error).__name__}: {error}")
+
+
+##############################
+# Measurements
+##############################
+
+def rss():
+    """
+    Returns the resident memory of this process in bytes.
+    """
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+        # Peak rather than current on other systems, kilobytes on Linux and bytes on macOS
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage if sys.platform == "darwin" else usage * 1024
+
+
+class MemorySampler(threading.Thread):
+    def __init__(self, interval=0.1):
+        super().__init__(name="memory-sampler", daemon=True)
+        self.interval = interval
+        self.peak = rss()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.peak = max(self.peak, rss())
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+def percentiles(values):
+    values = sorted(values)
+    if not values:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None}
+
+    def rank(q):
+        # Nearest rank
+        return values[min(len(values) - 1, max(0, int(round(q * len(values))) - 1))] * 1000
+
+    return {"p50_ms": rank(0.50), "p95_ms": rank(0.95), "p99_ms": rank(0.99), "max_ms": values[-1] * 1000}
+
+
+##############################
+# Runner
+##############################
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=10, help="Sessions running at the same time")
+    parser.add_argument("--rounds", type=int, default=2, help="Times every session runs every scenario")
+    parser.add_argument("--ramp-up", type=float, default=2, help="Seconds over which the sessions are started")
+    parser.add_argument("--seed", type=int, default=1, help="Seed of the scenario orders")
+    parser.add_argument("--port", type=int, default=5098, help="Port of the fake API")
+    parser.add_argument("--timeout", type=float, default=300, help="Seconds allowed for a rerun")
+    parser.add_argument("--no-warm-up", action="store_true", help="Measure from a cold process, imports and caches included")
+    parser.add_argument("--no-warmer", action="store_true", help="Disable the cache warmer, as in the other benchmarks")
+    parser.add_argument("--json", help="Write the results to this file")
+    fake_api.add_arguments(parser)
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    process, url = fake_api.spawn(args.port, args.latency, **fake_api.sizes(args))
+    reruns, errors = [], []
+    try:
+        scenarios = bench_pages.scenarios(bench_pages.sample_ids(url))
+        with tempfile.TemporaryDirectory() as cache_dir:
+            secrets = {"api_url": url, "cache_dir": cache_dir, "warm_caches": not args.no_warmer}
+            with Server(secrets):
+                if not args.no_warm_up:
+                    session(0, scenarios, 1, args.timeout, args.seed, [], errors)
+                fake_api.request_counts(url, reset=True)
+                rss_start = rss()
+                sampler = MemorySampler()
+                sampler.start()
+                threads = [
+                    threading.Thread(
+                        target=session, name=f"session-{number}",
+                        args=(number, scenarios, args.rounds, args.timeout, args.seed, reruns, errors),
+                    )
+                    for number in range(args.sessions)
+                ]
+                start = time.perf_counter()
+                for thread in threads:
+                    thread.start()
+                    time.sleep(args.ramp_up / max(args.sessions, 1))
+                for thread in threads:
+                    thread.join()
+                elapsed = time.perf_counter() - start
+                sampler.stop()
+                rss_end = rss()
+        api_requests = fake_api.request_counts(url)
+    finally:
+        process.terminate()
+        process.wait()
+
+    pages = sorted({page for page, _ in reruns})
+    result = {
+        "sessions": args.sessions,
+        "reruns": len(reruns),
+        "errors": errors,
+        "elapsed_s": elapsed,
+        "reruns_per_s": len(reruns) / elapsed,
+        "latency": percentiles([seconds for _, seconds in reruns]),
+        "pages": {page: percentiles([seconds for name, seconds in reruns if name == page]) for page in pages},
+        "api_requests": api_requests,
+        "memory": {
+            "start_mb": rss_start / 2 ** 20,
+            "end_mb": rss_end / 2 ** 20,
+            "peak_mb": sampler.peak / 2 ** 20,
+            "growth_mb": (rss_end - rss_start) / 2 ** 20,
+        },
+    }
+    print_result(result)
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump({"arguments": vars(args), "result": result}, file, indent=2)
+    if errors:
+        sys.exit(1)
+
+
+def print_result(result):
+    def row(name, latency):
+        print(f"{name:<30} {latency['p50_ms']:>8.0f}ms {latency['p95_ms']:>8.0f}ms {latency['p99_ms']:>8.0f}ms {latency['max_ms']:>8.0f}ms")
+
+    print(f"{result['sessions']} sessions, {result['reruns']:,} reruns in {result['elapsed_s']:.1f}s ({result['reruns_per_s']:.1f}/s), {len(result['errors'])} errors")
+    for error in result["errors"][:10]:
+        print(f"  {error}")
+    print()
+    print(f"{'rerun latency':<30} {'p50':>10} {'p95':>10} {'p99':>10} {'max':>10}")
+    for page, latency in result["pages"].items():
+        row(page, latency)
+    row("all", result["latency"])
+    print()
+    print(f"{'API endpoint':<30} {'requests':>10}")
+    for endpoint, count in sorted(result["api_requests"].items()):
+        print(f"{endpoint:<30} {count:>10,}")
+    print(f"{'total':<30} {sum(result['api_requests'].values()):>10,}")
+    print()
+    memory = result["memory"]
+    print(f"Resident memory: {memory['start_mb']:.0f}MB at start, {memory['end_mb']:.0f}MB at the end "
+          f"({memory['growth_mb']:+.0f}MB), {memory['peak_mb']:.0f}MB at peak")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Renders every dashboard page against a local fake vps-rest-api and reports,
+per scenario, the render time, number of API calls and peak Python memory.
+
+Pages are driven through Streamlit's AppTest, including the form flows of
+the Races, Drivers, Lap Time Comparator and Driver Performance pages:
+
+    python benchmarks/bench_pages.py --runs 5 --latency 50 --json baseline.json
+
+The first run of a scenario is reported separately as it fills the process
+and on-disk caches, the following runs show the warm path. Peak memory is
+traced on an extra warm run, tracing slowing down the timed ones.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+import fake_api
+import requests
+from streamlit.testing.v1 import AppTest
+
+
+##############################
+# Scenarios
+##############################
+
+def fill_query_form(filter_query="", sort="", order="asc", page_size=100, keep_columns="", local_mode=False):
+    def interact(at):
+        at.number_input[1].set_value(page_size)
+        at.selectbox[0].set_value(sort)
+        at.selectbox[1].set_value(order)
+        at.text_input[0].set_value(filter_query)
+        at.text_input[1].set_value(keep_columns)
+        at.main.toggle[0].set_value(local_mode)
+        at.button[0].click()
+    return interact
+
+
+def compare_drivers(driver_ids):
+    def interact(at):
+        at.multiselect[0].set_value(driver_ids)
+        at.button[0].click()
+    return interact
+
+
+def driver_performance(driver_id, circuit_id, year=""):
+    def interact(at):
+        at.selectbox[0].set_value(driver_id)
+        at.selectbox[1].set_value(circuit_id)
+        at.text_input[0].set_value(year)
+        at.button[0].click()
+    return interact
+
+
+def scenarios(sample):
+    """
+    Returns `(name, page, interaction)` for every scenario, `sample` holding
+    ids of drivers and a circuit that have laps (see `sample_ids`).
+    """
+    year = datetime.now().year
+    races_query = fill_query_form(f"year>={year - 1}", "date", "desc")
+    standings_query = fill_query_form(f"race.year={year - 1}", "points", "desc", keep_columns="race,driver,points,wins")
+    return [
+        ("Home", "streamlit_app.py", None),
+        ("Circuits", "pages/circuits.py", None),
+        ("Races", "pages/races.py", None),
+        ("Races: custom query", "pages/races.py", races_query),
+        ("Races: local query", "pages/races.py", fill_query_form(f"year>={year - 1}", "date", "desc", local_mode=True)),
+        ("Drivers", "pages/drivers.py", None),
+        ("Drivers: custom query", "pages/drivers.py", standings_query),
+        ("Drivers: local query", "pages/drivers.py", fill_query_form(f"race.year={year - 1}", "points", "desc", keep_columns="race,driver,points,wins", local_mode=True)),
+        ("Lap Time Comparator", "pages/lap_times.py", None),
+        ("Lap Time Comparator: 3 drivers", "pages/lap_times.py", compare_drivers(sample["drivers"])),
+        ("Driver Performance", "pages/driver_performance.py", None),
+        ("Driver Performance: circuit", "pages/driver_performance.py", driver_performance(sample["driverId"], sample["circuitId"])),
+    ]
+
+
+def sample_ids(url):
+    records = requests.get(f"{url}/drivers/standings", params={"pageSize": 3}, timeout=30).json()["records"]
+    return {
+        "driverId": records[0]["driverId"],
+        "circuitId": records[0]["race"]["circuitId"],
+        "drivers": [record["driverId"] for record in records],
+    }
+
+
+##############################
+# Runner
+##############################
+
+def render(page, interaction, url, cache_dir, timeout):
+    """
+    Renders a page in a new session, then runs its interaction if any.
+    Returns the AppTest once everything has been rendered.
+    """
+    at = AppTest.from_file(os.path.join(ROOT, "src", "streamlit_app.py"), default_timeout=timeout)
+    at.secrets["api_url"] = url
+    at.secrets["cache_dir"] = cache_dir
+    # Background refreshes would be counted in the API calls of whatever scenario runs
+    at.secrets["warm_caches"] = False
+    if page != "streamlit_app.py":
+        at.switch_page(page)
+    at.run()
+    if interaction:
+        interaction(at)
+        at.run()
+    if at.exception:
+        raise RuntimeError(f"{page} raised: {at.exception[0].value}")
+    return at
+
+
+def measure(page, interaction, url, cache_dir, timeout, trace_memory=False):
+    fake_api.request_counts(url, reset=True)
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    render(page, interaction, url, cache_dir, timeout)
+    elapsed = time.perf_counter() - start
+    peak = 0
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    calls = sum(fake_api.request_counts(url).values())
+    return elapsed, calls, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="Runs per scenario, the first one being reported as cold")
+    parser.add_argument("--port", type=int, default=5099, help="Port of the fake API")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds allowed for a page to render")
+    parser.add_argument("--only", help="Only run the scenarios whose name contains this text")
+    parser.add_argument("--json", help="Write the results to this file")
+    fake_api.add_arguments(parser)
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    process, url = fake_api.spawn(args.port, args.latency, **fake_api.sizes(args))
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            for name, page, interaction in scenarios(sample_ids(url)):
+                if args.only and args.only.lower() not in name.lower():
+                    continue
+                runs = [measure(page, interaction, url, cache_dir, args.timeout) for _ in range(max(args.runs, 1))]
+                _, _, peak = measure(page, interaction, url, cache_dir, args.timeout, trace_memory=True)
+                warm = runs[1:] or runs
+                results.append({
+                    "scenario": name,
+                    "page": page,
+                    "cold_ms": runs[0][0] * 1000,
+                    "warm_ms": statistics.median(run[0] for run in warm) * 1000,
+                    "cold_api_calls": runs[0][1],
+                    "warm_api_calls": statistics.median(run[1] for run in warm),
+                    "peak_memory_mb": peak / 2 ** 20,
+                })
+                print_result(results[-1])
+    finally:
+        process.terminate()
+        process.wait()
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump({"arguments": vars(args), "results": results}, file, indent=2)
+
+
+def print_result(result):
+    if not getattr(print_result, "header", False):
+        print(f"{'scenario':<34} {'cold':>9} {'warm':>9} {'calls':>7} {'warm calls':>11} {'peak mem':>9}")
+        print_result.header = True
+    print(
+        f"{result['scenario']:<34} {result['cold_ms']:>7.0f}ms {result['warm_ms']:>7.0f}ms "
+        f"{result['cold_api_calls']:>7} {result['warm_api_calls']:>11g} {result['peak_memory_mb']:>7.1f}MB"
+    )
+
+
+if __name__ == "__main__":
+    main()
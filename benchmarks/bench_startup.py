@@ -0,0 +1,174 @@
+"""
+Measures the cold start of every dashboard page, each in a fresh Python
+process: the time to import the modules the page script imports, the heavy
+libraries this loads, and the time to its first render against a local
+fake vps-rest-api.
+
+    python benchmarks/bench_startup.py --runs 5 --json startup.json
+
+Pass a previous `--json` output as `--baseline` to catch regressions: the
+script exits with an error when the first render of a page got slower than
+in the baseline by more than `--tolerance`.
+"""
+import argparse
+import ast
+import importlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, "src")
+
+import fake_api
+
+PAGES = [
+    "streamlit_app.py",
+    "pages/circuits.py",
+    "pages/races.py",
+    "pages/drivers.py",
+    "pages/lap_times.py",
+    "pages/driver_performance.py",
+]
+# Libraries worth deferring until a page needs them
+HEAVY = ["numpy", "pandas", "pyarrow.parquet", "plotly.express", "requests"]
+
+
+##############################
+# Measurements, in a fresh process
+##############################
+
+def page_imports(page):
+    """
+    Returns the modules imported at the top level of a page script.
+    """
+    with open(os.path.join(SRC, page)) as file:
+        tree = ast.parse(file.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            modules.append(node.module)
+    return modules
+
+
+def measure_imports(page):
+    import streamlit  # noqa: F401, part of every page but not of the page's own cost
+
+    start = time.perf_counter()
+    for module in page_imports(page):
+        importlib.import_module(module)
+    return {
+        "import_ms": (time.perf_counter() - start) * 1000,
+        "heavy": [module for module in HEAVY if module in sys.modules],
+    }
+
+
+def measure_first_paint(page, url, cache_dir, timeout):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(SRC, "streamlit_app.py"), default_timeout=timeout)
+    at.secrets["api_url"] = url
+    at.secrets["cache_dir"] = cache_dir
+    at.secrets["warm_caches"] = False
+    if page != "streamlit_app.py":
+        at.switch_page(page)
+    start = time.perf_counter()
+    at.run()
+    elapsed = time.perf_counter() - start
+    if at.exception:
+        raise RuntimeError(f"{page} raised: {at.exception[0].value}")
+    return {"first_paint_ms": elapsed * 1000}
+
+
+def child(args):
+    sys.path.insert(0, SRC)
+    os.chdir(ROOT)
+    if args.child == "imports":
+        result = measure_imports(args.page)
+    else:
+        result = measure_first_paint(args.page, args.url, args.cache_dir, args.timeout)
+    print(json.dumps(result))
+
+
+def run_child(mode, page, url="", cache_dir="", timeout=120):
+    arguments = [sys.executable, __file__, "--child", mode, "--page", page, "--url", url, "--cache-dir", cache_dir, "--timeout", str(timeout)]
+    output = subprocess.run(arguments, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+##############################
+# Runner
+##############################
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="Fresh processes per page and measurement")
+    parser.add_argument("--port", type=int, default=5097, help="Port of the fake API")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds allowed for a page to render")
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--baseline", help="Results of a previous run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Slowdown of the first render tolerated against the baseline")
+    parser.add_argument("--child", choices=["imports", "first_paint"], help=argparse.SUPPRESS)
+    parser.add_argument("--page", help=argparse.SUPPRESS)
+    parser.add_argument("--url", help=argparse.SUPPRESS)
+    parser.add_argument("--cache-dir", help=argparse.SUPPRESS)
+    fake_api.add_arguments(parser)
+    args = parser.parse_args()
+    if args.child:
+        return child(args)
+
+    process, url = fake_api.spawn(args.port, args.latency, **fake_api.sizes(args))
+    results = []
+    try:
+        for page in PAGES:
+            imports = [run_child("imports", page) for _ in range(max(args.runs, 1))]
+            paints = []
+            for _ in range(max(args.runs, 1)):
+                # A new cache directory each time, nothing is stored from a previous process
+                with tempfile.TemporaryDirectory() as cache_dir:
+                    paints.append(run_child("first_paint", page, url, cache_dir, args.timeout))
+            results.append({
+                "page": page,
+                "import_ms": statistics.median(run["import_ms"] for run in imports),
+                "first_paint_ms": statistics.median(run["first_paint_ms"] for run in paints),
+                "heavy": imports[0]["heavy"],
+            })
+            print_result(results[-1])
+    finally:
+        process.terminate()
+        process.wait()
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump({"arguments": vars(args), "results": results}, file, indent=2)
+    if args.baseline:
+        sys.exit(compare(results, args.baseline, args.tolerance))
+
+
+def compare(results, baseline_file, tolerance):
+    with open(baseline_file) as file:
+        baseline = {result["page"]: result for result in json.load(file)["results"]}
+    regressions = 0
+    for result in results:
+        before = baseline.get(result["page"])
+        if before and result["first_paint_ms"] > before["first_paint_ms"] * (1 + tolerance):
+            regressions += 1
+            print(f"REGRESSION {result['page']}: first render {before['first_paint_ms']:.0f}ms -> {result['first_paint_ms']:.0f}ms")
+    return 1 if regressions else 0
+
+
+def print_result(result):
+    if not getattr(print_result, "header", False):
+        print(f"{'page':<30} {'imports':>9} {'first render':>13}  heavy libraries loaded by the imports")
+        print_result.header = True
+    print(f"{result['page']:<30} {result['import_ms']:>7.0f}ms {result['first_paint_ms']:>11.0f}ms  {', '.join(result['heavy']) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
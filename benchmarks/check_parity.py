@@ -0,0 +1,77 @@
+"""
+Checks that the Local mode of the Custom Query forms matches the API: runs
+every filter of `CASES` through `src/query.py` against the locally loaded
+table and through the API, and compares the ids of the matching records.
+
+    python benchmarks/check_parity.py
+    python benchmarks/check_parity.py --url http://localhost:5000
+
+Runs against a local fake vps-rest-api unless `--url` is passed. Exits with
+an error when any filter matches different records.
+"""
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+import fake_api
+import streamlit as st
+
+from streamlit.runtime.secrets import Secrets
+
+# Endpoint, id field and filter of every checked query
+CASES = [
+    # `number` is missing for some drivers, which never match, not even `!=`
+    ("/drivers", "driverId", "number!=5"),
+    ("/drivers", "driverId", "number=5"),
+    ("/drivers", "driverId", "number>50"),
+    ("/drivers", "driverId", "number<=50"),
+    ("/drivers", "driverId", "nationality!=Nationality 3"),
+    ("/drivers", "driverId", "forename=Forename7,number>=10"),
+    ("/races", "raceId", "round>10,circuit.country!=Country 4"),
+    ("/circuits", "circuitId", "alt<100"),
+]
+
+
+def check(path, id_field, filter_query):
+    """
+    Returns the ids matched by the API and locally, in id order.
+    """
+    import api
+    import query
+
+    records = api.get_all_records(path, {"filter": filter_query, "sort": id_field, "order": "asc"})
+    table = query.load_table(path)
+    positions = query.select(table, filter_query, id_field, "asc")
+    return [record[id_field] for record in records], table[id_field].take(positions).tolist()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="API to check against, a fake API is started when missing")
+    parser.add_argument("--port", type=int, default=5097, help="Port of the fake API")
+    args = parser.parse_args()
+
+    process, url = (None, args.url) if args.url else fake_api.spawn(args.port, latency=0)
+    mismatches = 0
+    try:
+        st.secrets = Secrets([])
+        st.secrets._secrets = {"api_url": url}
+        print(f"{'endpoint':<12} {'filter':<40} {'API':>6} {'local':>6}")
+        for path, id_field, filter_query in CASES:
+            remote, local = check(path, id_field, filter_query)
+            same = remote == local
+            mismatches += not same
+            print(f"{path:<12} {filter_query:<40} {len(remote):>6} {len(local):>6}{'' if same else '  MISMATCH'}")
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
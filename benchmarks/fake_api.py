@@ -0,0 +1,363 @@
+"""
+Local stand-in for vps-rest-api serving synthetic data, used by the benchmarks.
+
+Implements the endpoints used by the dashboard with the same filter, sort and
+paging query parameters. Sizes and latency are configurable:
+
+    python benchmarks/fake_api.py --port 5000 --seasons 20 --latency 50
+
+`GET /_stats` returns the number of requests served per endpoint and
+`POST /_stats/reset` resets them.
+"""
+import argparse
+import functools
+import json
+import math
+import random
+import re
+import sys
+import subprocess
+import threading
+import time
+import urllib.request
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+CLAUSE = re.compile(r"^\s*([\w.]+)\s*(>=|<=|!=|=|>|<)\s*(.*?)\s*$")
+COMPARISONS = {
+    "=": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    ">": lambda a, b: a > b,
+    "<": lambda a, b: a < b,
+    ">=": lambda a, b: a >= b,
+    "<=": lambda a, b: a <= b,
+}
+
+
+##############################
+# Synthetic data
+##############################
+
+def format_time(milliseconds):
+    minutes, remainder = divmod(milliseconds, 60000)
+    seconds, millis = divmod(remainder, 1000)
+    return f"{minutes}:{seconds:02d}.{millis:03d}"
+
+
+def build_dataset(circuits=77, drivers=900, seasons=5, races_per_season=20, drivers_per_race=20, laps_per_race=60, seed=1):
+    rnd = random.Random(seed)
+    circuit_records = [{
+        "circuitId": i,
+        "circuitRef": f"circuit_{i}",
+        "name": f"Circuit {i}",
+        "location": f"Location {i}",
+        "country": f"Country {i % 35}",
+        "lat": round(rnd.uniform(-50, 60), 4),
+        "lng": round(rnd.uniform(-120, 150), 4),
+        "alt": rnd.randint(-10, 2200),
+        "url": f"https://example.com/circuit_{i}",
+    } for i in range(1, circuits + 1)]
+
+    driver_records = [{
+        "driverId": i,
+        "driverRef": f"driver_{i}",
+        "number": i % 100 or None,
+        "code": f"D{i:03d}"[-3:],
+        "forename": f"Forename{i % 150}",
+        "surname": f"Surname{i}",
+        "dob": f"{1940 + i % 60}-0{1 + i % 9}-1{i % 10}T00:00:00",
+        "nationality": f"Nationality {i % 40}",
+        "url": f"https://example.com/driver_{i}",
+    } for i in range(1, drivers + 1)]
+
+    current_year = time.localtime().tm_year
+    race_records = []
+    for year in range(current_year - seasons + 1, current_year + 1):
+        for round_number in range(1, races_per_season + 1):
+            circuit = circuit_records[(year * 7 + round_number) % len(circuit_records)]
+            race_records.append({
+                "raceId": len(race_records) + 1,
+                "year": year,
+                "round": round_number,
+                "circuitId": circuit["circuitId"],
+                "name": f"{circuit['country']} Grand Prix",
+                "date": f"{year}-{1 + (round_number - 1) * 11 // races_per_season:02d}-{1 + round_number % 28:02d}T00:00:00",
+                "time": "14:00:00",
+                "circuit": circuit,
+            })
+
+    standing_records, lap_records = [], []
+    for race in race_records:
+        field = rnd.sample(driver_records, min(drivers_per_race, len(driver_records)))
+        for position, driver in enumerate(field, 1):
+            standing_records.append({
+                "driverStandingsId": len(standing_records) + 1,
+                "raceId": race["raceId"],
+                "driverId": driver["driverId"],
+                "points": float(rnd.randint(0, 450)),
+                "position": position,
+                "positionText": str(position),
+                "wins": rnd.randint(0, 15),
+                "race": race,
+                "driver": driver,
+            })
+            base = 70000 + race["circuitId"] * 450 + position * 40
+            for lap in range(1, laps_per_race + 1):
+                milliseconds = base + rnd.randint(0, 4000) + (25000 if rnd.random() < 0.03 else 0)
+                lap_records.append({
+                    "raceId": race["raceId"],
+                    "driverId": driver["driverId"],
+                    "lap": lap,
+                    "position": position,
+                    "time": format_time(milliseconds),
+                    "milliseconds": milliseconds,
+                    "race": race,
+                })
+
+    return {
+        "circuits": circuit_records,
+        "drivers": driver_records,
+        "races": race_records,
+        "driver_standings": standing_records,
+        "lap_times": lap_records,
+    }
+
+
+##############################
+# Query evaluation
+##############################
+
+def field_value(record, path):
+    for part in path.split("."):
+        if not isinstance(record, dict):
+            return None
+        if part not in record:
+            part = next((key for key in record if key.lower() == part.lower()), part)
+        record = record.get(part)
+    return record
+
+
+def apply_filter(records, query):
+    for clause in filter(str.strip, query.split(",")):
+        match = CLAUSE.match(clause)
+        if not match:
+            raise ValueError(f"Invalid filter clause: {clause}")
+        path, operator, raw = match.groups()
+        compare = COMPARISONS[operator]
+
+        def matches(record):
+            value = field_value(record, path)
+            if value is None:
+                return False
+            target = raw
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                target = float(raw)
+            return compare(value, target)
+
+        records = [record for record in records if matches(record)]
+    return records
+
+
+@functools.lru_cache(maxsize=64)
+def query(data_id, collection, filter_query, sort, order):
+    # Paging through a result set doesn't rescan the collection for every page
+    records = apply_filter(DATASETS[data_id][collection], filter_query)
+    if sort:
+        records = sorted(
+            records,
+            key=lambda record: (field_value(record, sort) is None, field_value(record, sort)),
+            reverse=order != "asc",
+        )
+    return records
+
+
+def paginate(data, collection, params):
+    records = query(id(data), collection, params.get("filter", ""), params.get("sort", ""), params.get("order", "asc"))
+    page = int(params.get("page", 1))
+    page_size = int(params.get("pageSize", 10))
+    return {
+        "_metadata": {
+            "page": page,
+            "pageSize": page_size,
+            "totalPages": max(1, math.ceil(len(records) / page_size)),
+            "totalCount": len(records),
+        },
+        "records": records[(page - 1) * page_size:page * page_size],
+    }
+
+
+def lap_summary(data, driver_id, year):
+    laps = {}
+    for record in data["lap_times"]:
+        if record["driverId"] == driver_id and (not year or record["race"]["year"] == int(year)):
+            laps.setdefault(record["race"]["circuitId"], []).append(record["milliseconds"])
+    circuits = {circuit["circuitId"]: circuit for circuit in data["circuits"]}
+    return [{
+        "circuit": circuits[circuit_id],
+        "meanTime": format_time(round(sum(times) / len(times))),
+        "fastestTime": format_time(min(times)),
+    } for circuit_id, times in laps.items()]
+
+
+##############################
+# Server
+##############################
+
+# Datasets served by this process, by id
+DATASETS = {}
+
+COLLECTIONS = {
+    "/circuits": "circuits",
+    "/drivers": "drivers",
+    "/races": "races",
+    "/drivers/standings": "driver_standings",
+    "/races/laptimes": "lap_times",
+}
+
+
+class FakeApi(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, data, latency=0.0):
+        super().__init__(address, Handler)
+        DATASETS[id(data)] = data
+        self.data = data
+        self.latency = latency
+        self.stats = {}
+        self.stats_lock = threading.Lock()
+
+    def count(self, endpoint):
+        with self.stats_lock:
+            self.stats[endpoint] = self.stats.get(endpoint, 0) + 1
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, body, status=200):
+        raw = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def do_POST(self):
+        if urlparse(self.path).path == "/_stats/reset":
+            with self.server.stats_lock:
+                self.server.stats.clear()
+            return self.send_json({})
+        self.send_json({"error": "Not found"}, 404)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        path = url.path.rstrip("/").lower()
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        if path == "/_stats":
+            with self.server.stats_lock:
+                return self.send_json(dict(self.server.stats))
+
+        data = self.server.data
+        summary = re.fullmatch(r"/races/laptimes/(\d+)", path)
+        self.server.count("/races/lapTimes/{driverId}" if summary else url.path.rstrip("/"))
+        time.sleep(self.server.latency)
+        try:
+            if path == "/database/metrics":
+                return self.send_json({name: len(records) for name, records in data.items()})
+            if summary:
+                return self.send_json(lap_summary(data, int(summary.group(1)), params.get("year")))
+            if path in COLLECTIONS:
+                return self.send_json(paginate(data, COLLECTIONS[path], params))
+        except ValueError as error:
+            return self.send_json({"error": str(error)}, 400)
+        self.send_json({"error": "Not found"}, 404)
+
+
+def start(port=0, latency=0.0, **sizes):
+    """
+    Starts the fake API on a background thread and returns the server,
+    its address being `http://127.0.0.1:{server.server_port}`.
+    """
+    server = FakeApi(("127.0.0.1", port), build_dataset(**sizes), latency)
+    threading.Thread(target=server.serve_forever, name="fake-api", daemon=True).start()
+    return server
+
+
+def spawn(port, latency=20, **sizes):
+    """
+    Runs the fake API in a separate process, so it doesn't take part in the
+    measurements of the benchmark process, and waits until it is ready.
+    Returns the process and the API url.
+    """
+    arguments = [sys.executable, __file__, "--port", str(port), "--latency", str(latency)]
+    for name, value in sizes.items():
+        arguments += [f"--{name.replace('_', '-')}", str(value)]
+    process = subprocess.Popen(arguments)
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(600):
+        try:
+            urllib.request.urlopen(f"{url}/_stats", timeout=1).close()
+            return process, url
+        except OSError:
+            if process.poll() is not None:
+                raise RuntimeError("The fake API failed to start")
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("The fake API did not start in time")
+
+
+def request_counts(url, reset=False):
+    """
+    Returns the requests served by a fake API per endpoint, optionally resetting them.
+    """
+    with urllib.request.urlopen(f"{url}/_stats", timeout=5) as response:
+        counts = json.load(response)
+    if reset:
+        urllib.request.urlopen(urllib.request.Request(f"{url}/_stats/reset", method="POST"), timeout=5).close()
+    return counts
+
+
+def add_arguments(parser):
+    """
+    Adds the dataset size and latency options shared by the benchmarks.
+    """
+    parser.add_argument("--circuits", type=int, default=77)
+    parser.add_argument("--drivers", type=int, default=900)
+    parser.add_argument("--seasons", type=int, default=5)
+    parser.add_argument("--races-per-season", type=int, default=20)
+    parser.add_argument("--drivers-per-race", type=int, default=20)
+    parser.add_argument("--laps-per-race", type=int, default=60)
+    parser.add_argument("--latency", type=float, default=20, help="Latency added to every request, in milliseconds")
+
+
+def sizes(args):
+    return {
+        "circuits": args.circuits,
+        "drivers": args.drivers,
+        "seasons": args.seasons,
+        "races_per_season": args.races_per_season,
+        "drivers_per_race": args.drivers_per_race,
+        "laps_per_race": args.laps_per_race,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=5000)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server = FakeApi(("127.0.0.1", args.port), build_dataset(**sizes(args)), args.latency / 1000)
+    print(f"Serving fake vps-rest-api on http://127.0.0.1:{server.server_port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+import math
+import threading
+import streamlit as st
+import requests
+
+import gate
+import cache
+import tracing
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from urllib3.util import Retry
+from urllib3.util.request import ACCEPT_ENCODING
+
+# Records per page when reading every page of an endpoint
+DEFAULT_PAGE_SIZE = 1000
+
+# Base class of every error raised by the helpers in this module
+RequestException = requests.RequestException
+
+@st.cache_resource(show_spinner=False)
+def session():
+    """
+    Returns the process-wide HTTP session used to talk to vps-rest-api.
+
+    The session keeps connections alive in a shared pool, retries idempotent
+    requests with exponential backoff and negotiates compressed responses
+    (gzip/deflate, plus brotli when the `brotli` package is installed).
+    """
+    # Read timeouts aren't retried: every retry runs within the caller's slot
+    # of the outbound gate, which a hung API would hold for several timeouts
+    retries = Retry(
+        total=cache.setting("api_retries"),
+        read=0,
+        backoff_factor=cache.setting("api_backoff"),
+        status_forcelist=(429, 502, 503, 504),
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    pool_size = cache.setting("api_pool_size")
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retries)
+
+    http = requests.Session()
+    http.mount("http://", adapter)
+    http.mount("https://", adapter)
+    http.headers.update({
+        "Accept": "application/json",
+        "Accept-Encoding": ACCEPT_ENCODING,
+        "Connection": "keep-alive",
+    })
+    return http
+
+def url(path):
+    return f"{cache.setting('api_url')}{path}"
+
+def timeout():
+    return (
+        cache.setting("api_connect_timeout"),
+        cache.setting("api_read_timeout"),
+    )
+
+@st.cache_resource(show_spinner=False)
+def outbound_gate():
+    """
+    Returns the process-wide gate every request to the API goes through, its
+    concurrency limit adapting between `api_min_concurrency` and the pool size.
+    """
+    pool_size = cache.setting("api_pool_size")
+    limiter = gate.AdaptiveLimiter(
+        initial=pool_size // 2,
+        min_limit=cache.setting("api_min_concurrency"),
+        max_limit=pool_size,
+    )
+    return gate.Gate(
+        limiter,
+        threshold=cache.setting("api_failure_threshold"),
+        cooldown=cache.setting("api_circuit_cooldown"),
+        queue_timeout=cache.setting("api_queue_timeout"),
+    )
+
+# Identical GET requests in flight at the same time share a single upstream call
+_in_flight = cache.SingleFlight()
+
+# Last successful response of every request, served when the API fails
+_fallbacks = cache.LRUCache("api fallback", cache.budget("api_fallback_bytes"))
+
+def _send(key, path, params, headers):
+    try:
+        response = outbound_gate().call(
+            gate.endpoint(path),
+            lambda: session().get(url(path), params=params, headers=headers, timeout=timeout()),
+        )
+    except RequestException:
+        fallback = _fallbacks.get(key)
+        if fallback is None:
+            raise
+        return fallback
+    if response.status_code >= 500:
+        fallback = _fallbacks.get(key)
+        return response if fallback is None else fallback
+    if response.status_code == 200:
+        _fallbacks.put(key, response, size=len(response.content))
+    return response
+
+def get(path, params=None, headers=None):
+    """
+    Performs a GET request against the API, `path` being relative to `api_url`
+    (eg: `/circuits`). Query parameters are passed as a dict so values such as
+    filters are encoded correctly.
+
+    Concurrent identical requests, from any session, are coalesced into one
+    and receive the same response object, which must not be modified.
+
+    Requests go through the outbound gate. When it refuses them, or the API
+    fails, the last successful response to the same request is returned
+    instead. Without one, refused requests raise `gate.Rejected`.
+    """
+    key = (url(path), tuple(sorted((params or {}).items())), tuple(sorted((headers or {}).items())))
+    with tracing.span("api", path):
+        return _in_flight.do(key, lambda: _send(key, path, params, headers))
+
+def decode(response):
+    """
+    Decodes the JSON body of a response.
+    """
+    with tracing.span("decode", urlparse(response.url).path):
+        return response.json()
+
+##############################
+# Concurrency
+##############################
+
+def executor(max_workers, thread_name_prefix):
+    """
+    Returns a thread pool whose workers share the calling script's run context,
+    so Streamlit APIs (secrets, caches) can be used from them without warnings.
+    Workers of a detached thread are detached from the session's timings too.
+    """
+    ctx = get_script_run_ctx(suppress_warning=True)
+    detached = tracing.is_detached()
+
+    def initializer():
+        add_script_run_ctx(threading.current_thread(), ctx)
+        if detached:
+            tracing.detach()
+
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix, initializer=initializer)
+
+##############################
+# Pagination
+##############################
+
+def page_count(metadata, page_size):
+    """
+    Returns the number of pages of a query from the `_metadata` of one of its
+    pages, or None when the metadata doesn't tell.
+    """
+    for key in ("totalPages", "pageCount", "total_pages"):
+        if metadata.get(key) is not None:
+            return int(metadata[key])
+    for key in ("totalCount", "totalRecords", "totalItems", "total_count"):
+        if metadata.get(key) is not None:
+            return max(1, math.ceil(int(metadata[key]) / page_size))
+    return None
+
+def _fetch_page(path, params, page, page_size):
+    response = get(path, params={**(params or {}), "page": page, "pageSize": page_size})
+    response.raise_for_status()
+    return decode(response)
+
+def _walk_pages(path, params, page_size, records):
+    # No page count in the metadata, walk the pages until a short one comes back
+    page = 1
+    while len(records) == page_size:
+        page += 1
+        records = _fetch_page(path, params, page, page_size)["records"]
+        yield page, records
+
+def iter_pages(path, params=None, page_size=DEFAULT_PAGE_SIZE, max_workers=None, first_page=None):
+    """
+    Yields `(page, records)` for every page of a paginated endpoint.
+
+    The first page is fetched on its own to read `_metadata`, the remaining
+    pages are then requested in parallel on a bounded thread pool and yielded
+    in the order they arrive. Raises `requests.HTTPError` if any page fails.
+    An already decoded first page can be passed as `first_page`.
+    """
+    first = first_page or _fetch_page(path, params, 1, page_size)
+    yield 1, first["records"]
+
+    total_pages = page_count(first.get("_metadata") or {}, page_size)
+    if total_pages is None:
+        yield from _walk_pages(path, params, page_size, first["records"])
+        return
+    if total_pages <= 1:
+        return
+
+    workers = min(max_workers or cache.setting("api_fetch_workers"), total_pages - 1)
+    pool = executor(workers, "api-page")
+    try:
+        futures = {pool.submit(_fetch_page, path, params, page, page_size): page for page in range(2, total_pages + 1)}
+        for future in as_completed(futures):
+            # Dropped once consumed, so a page's records are freed when the caller is done with them
+            yield futures.pop(future), future.result()["records"]
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def stream_pages(path, params=None, page_size=DEFAULT_PAGE_SIZE, max_workers=None):
+    """
+    Yields the records of every page of a paginated endpoint in page order.
+
+    Unlike `iter_pages`, at most `max_workers` pages are requested ahead of
+    the one being consumed, so memory stays bounded however many pages there
+    are. Raises `requests.HTTPError` if any page fails.
+    """
+    first = _fetch_page(path, params, 1, page_size)
+    yield first["records"]
+
+    total_pages = page_count(first.get("_metadata") or {}, page_size)
+    if total_pages is None:
+        for _, records in _walk_pages(path, params, page_size, first["records"]):
+            yield records
+        return
+    if total_pages <= 1:
+        return
+
+    workers = min(max_workers or cache.setting("api_fetch_workers"), total_pages - 1)
+    pool = executor(workers, "api-page")
+    try:
+        pending, next_page = deque(), 2
+        while pending or next_page <= total_pages:
+            while next_page <= total_pages and len(pending) < workers:
+                pending.append(pool.submit(_fetch_page, path, params, next_page, page_size))
+                next_page += 1
+            yield pending.popleft().result()["records"]
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def get_all_records(path, params=None, page_size=DEFAULT_PAGE_SIZE, max_workers=None, first_page=None):
+    """
+    Returns every record of a paginated endpoint as a list, in page order.
+    """
+    pages = dict(iter_pages(path, params, page_size, max_workers, first_page))
+    return [record for page in sorted(pages) for record in pages[page]]
+
+def get_all(path, params=None, page_size=DEFAULT_PAGE_SIZE, max_workers=None, normalize=False):
+    """
+    Returns every record of a paginated endpoint as a single DataFrame, in page order.
+    Each page is converted to a frame as soon as it arrives so decoding overlaps
+    with the requests still in flight. With `normalize`, nested objects are
+    flattened into dotted columns (eg: `race.circuit.name`).
+    """
+    # Deferred, pages only need pandas once they load a table
+    import pandas as pd
+    import frames
+
+    to_frame = frames.flatten if normalize else pd.DataFrame
+    chunks = {page: to_frame(records) for page, records in iter_pages(path, params, page_size, max_workers)}
+    return pd.concat([chunks[page] for page in sorted(chunks)], ignore_index=True)
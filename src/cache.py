@@ -0,0 +1,371 @@
+import sys
+import time
+import threading
+import functools
+import dataclasses
+import streamlit as st
+
+from collections import OrderedDict
+from concurrent.futures import Future
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+import tracing
+
+# Defaults used when the matching key is missing from .streamlit/secrets.toml,
+# settings without one (eg: `api_url`) being required
+SETTINGS = {
+    "api_connect_timeout": 3.05,
+    "api_read_timeout": 30,
+    "api_retries": 3,
+    "api_backoff": 0.3,
+    "api_pool_size": 32,
+    "api_fetch_workers": 8,
+    "api_min_concurrency": 2,
+    "api_queue_timeout": 5,
+    "api_failure_threshold": 5,
+    "api_circuit_cooldown": 30,
+    "cache_dir": ".cache",
+    "reference_max_age": 24 * 60 * 60,
+    "warm_caches": True,
+    # Memory budgets of the caches, in bytes
+    "cache_max_bytes": 512 * 1024 * 1024,
+    "query_cache_bytes": 64 * 1024 * 1024,
+    "lap_cache_bytes": 128 * 1024 * 1024,
+    "api_fallback_bytes": 32 * 1024 * 1024,
+}
+
+##############################
+# Settings
+##############################
+
+def setting(name):
+    """
+    Returns a setting from .streamlit/secrets.toml, or its default from
+    `SETTINGS` when it is missing. Raises KeyError on a missing required setting.
+    """
+    if name in SETTINGS:
+        return st.secrets.get(name, SETTINGS[name])
+    return st.secrets[name]
+
+##############################
+# Background threads
+##############################
+
+def background_thread(target, name, *args):
+    """
+    Returns a daemon thread running `target(*args)` on behalf of every session.
+    It borrows the calling script's run context, as Streamlit's caches and
+    secrets expect one, and its spans are left out of that session's timings.
+    """
+    def run():
+        tracing.detach()
+        target(*args)
+
+    thread = threading.Thread(target=run, name=name, daemon=True)
+    add_script_run_ctx(thread, get_script_run_ctx(suppress_warning=True))
+    return thread
+
+##############################
+# Request coalescing
+##############################
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls sharing a key: the first caller runs the
+    function while every other caller waits for and shares its result
+    (or exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            return future.result()
+
+        try:
+            result = func()
+            future.set_result(result)
+            return result
+        except BaseException as error:
+            future.set_exception(error)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+##############################
+# Size-aware LRU cache
+##############################
+
+def sizeof(value, _seen=None):
+    """
+    Estimates the memory held by a value in bytes: DataFrames and arrays
+    report their own, containers, dataclasses and their contents are walked.
+    """
+    seen = _seen if _seen is not None else set()
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    memory_usage = getattr(value, "memory_usage", None)
+    if callable(memory_usage):
+        usage = memory_usage(deep=True)
+        return int(getattr(usage, "sum", lambda: usage)())
+    if hasattr(value, "nbytes"):
+        return int(value.nbytes)
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(sizeof(key, seen) + sizeof(item, seen) for key, item in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(sizeof(item, seen) for item in value)
+    elif dataclasses.is_dataclass(value) and not isinstance(value, type):
+        size += sum(sizeof(getattr(value, field.name), seen) for field in dataclasses.fields(value))
+    return size
+
+def budget(key):
+    """
+    Returns a function reading the memory budget setting `key`, so it can be
+    changed without restarting the server.
+    """
+    return lambda: setting(key)
+
+# Every LRU cache of the process, for the memory panel
+_lru_caches = []
+
+class LRUCache:
+    """
+    Cache keeping the most recently used values under a memory budget: once
+    their estimated size exceeds `max_bytes`, a number or a function returning
+    it, the least recently used ones are evicted. Values larger than the whole
+    budget are not cached. Entries expire `ttl` seconds after they were
+    stored, never when None.
+    """
+
+    def __init__(self, name, max_bytes, ttl=None):
+        self.name = name
+        self.ttl = ttl
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.bytes = 0
+        self.evictions = 0
+        _lru_caches.append(self)
+
+    @property
+    def max_bytes(self):
+        return self._max_bytes() if callable(self._max_bytes) else self._max_bytes
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[1]
+
+    def lookup(self, key):
+        """
+        Returns `(stored_at, value)`, `stored_at` being a `time.monotonic()`
+        timestamp, or None when `key` isn't cached.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self.ttl is not None and time.monotonic() - entry[0] >= self.ttl:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[0], entry[2]
+
+    def get(self, key):
+        """
+        Returns the value of `key`, or None when it isn't cached.
+        """
+        entry = self.lookup(key)
+        tracing.count_cache(self.name, "miss" if entry is None else "hit")
+        return None if entry is None else entry[1]
+
+    def put(self, key, value, size=None):
+        """
+        Stores a value, its size being estimated with `sizeof` unless given.
+        Returns the value.
+        """
+        size = sizeof(value) if size is None else size
+        max_bytes = self.max_bytes
+        with self._lock:
+            self._remove(key)
+            if size > max_bytes:
+                return value
+            self._entries[key] = (time.monotonic(), size, value)
+            self.bytes += size
+            while self.bytes > max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return value
+
+    def clear(self, match=None):
+        """
+        Removes every entry, or those whose key `match(key)` is true for.
+        """
+        with self._lock:
+            for key in [key for key in self._entries if match is None or match(key)]:
+                self._remove(key)
+
+    def status(self):
+        with self._lock:
+            return {"cache": self.name, "entries": len(self._entries), "mb": self.bytes / 2 ** 20,
+                    "budget_mb": self.max_bytes / 2 ** 20, "evictions": self.evictions}
+
+def print_status():
+    """
+    Prints the memory held by every LRU cache in the sidebar.
+    """
+    with st.sidebar.expander("🧠 Cache memory", expanded=False):
+        st.dataframe([lru.status() for lru in _lru_caches], hide_index=True, use_container_width=True)
+
+##############################
+# Speculative prefetching
+##############################
+
+class Prefetcher:
+    """
+    Cache of results computed ahead of time on background threads, for what
+    the user is likely to ask for next. Results are kept in an `LRUCache`
+    under `max_bytes` for `ttl` seconds. Failed prefetches are dropped.
+    """
+
+    def __init__(self, name, max_bytes, ttl):
+        self.name = name
+        self.results = LRUCache(name, max_bytes, ttl)
+        self._lock = threading.Lock()
+        self._pending = {}
+
+    def get(self, key):
+        """
+        Returns the value of `key`, waiting for it if it is still being
+        prefetched, or None when it isn't cached.
+        """
+        with self._lock:
+            future = self._pending.get(key)
+        if future is None:
+            return self.results.get(key)
+        tracing.count_cache(self.name, "hit")
+        try:
+            return future.result()
+        except Exception:
+            return None
+
+    def put(self, key, value):
+        self.results.put(key, value)
+
+    def prefetch(self, key, func):
+        """
+        Starts computing `func()` in the background for `key`, unless it is
+        already cached or being prefetched.
+        """
+        with self._lock:
+            if key in self._pending or self.results.lookup(key) is not None:
+                return
+            future = self._pending[key] = Future()
+
+        def run():
+            try:
+                result = func()
+                self.results.put(key, result)
+                future.set_result(result)
+            except BaseException as error:
+                future.set_exception(error)
+            finally:
+                with self._lock:
+                    del self._pending[key]
+
+        background_thread(run, "prefetch").start()
+
+##############################
+# Stale-while-revalidate cache
+##############################
+
+_lock = threading.Lock()
+_entries = LRUCache("cached functions", budget("cache_max_bytes"))
+_refreshing = set()
+_flight = SingleFlight()
+
+def _store(key, value):
+    # Failed fetches (None) are not cached, the previous value keeps being served
+    if value is not None:
+        _entries.put(key, value)
+    return value
+
+def _refresh(key, func):
+    try:
+        _store(key, _flight.do(key, func))
+    except Exception:
+        pass
+    finally:
+        with _lock:
+            _refreshing.discard(key)
+
+def _refresh_in_background(key, func):
+    with _lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+    background_thread(_refresh, "cache-refresh", key, func).start()
+
+def swr(ttl, max_stale=None):
+    """
+    Caches a function's results process-wide, shared by every session.
+
+    Within `ttl` seconds the cached value is returned. Past it the stale value
+    is still returned immediately while a single background refresh runs,
+    for at most `max_stale` more seconds (forever when None). Concurrent
+    misses on the same arguments share a single call. Values are evicted,
+    least recently used first, past the `cache_max_bytes` budget shared by
+    every cached function. Returned values are shared and must not be modified.
+    """
+    def decorator(func):
+        # Page scripts redefine their functions on every rerun, key on the source instead
+        prefix = (func.__code__.co_filename, func.__qualname__)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (prefix, args, tuple(sorted(kwargs.items())))
+            call = functools.partial(func, *args, **kwargs)
+            entry = _entries.lookup(key)
+            if entry:
+                age = time.monotonic() - entry[0]
+                if age < ttl:
+                    tracing.count_cache(func.__qualname__, "hit")
+                    return entry[1]
+                if max_stale is None or age < ttl + max_stale:
+                    tracing.count_cache(func.__qualname__, "stale")
+                    _refresh_in_background(key, call)
+                    return entry[1]
+            tracing.count_cache(func.__qualname__, "miss")
+            return _store(key, _flight.do(key, call))
+
+        def refresh(*args, **kwargs):
+            # Recomputes the value now whatever its age, for the cache warmer
+            key = (prefix, args, tuple(sorted(kwargs.items())))
+            return _store(key, _flight.do(key, functools.partial(func, *args, **kwargs)))
+
+        def refresh_if_due(*args, **kwargs):
+            # Recomputes a missing or expired value in the background, for callers doing without it
+            key = (prefix, args, tuple(sorted(kwargs.items())))
+            entry = _entries.lookup(key)
+            if not entry or time.monotonic() - entry[0] >= ttl:
+                _refresh_in_background(key, functools.partial(func, *args, **kwargs))
+
+        def clear():
+            _entries.clear(lambda key: key[0] == prefix)
+
+        wrapper.ttl = ttl
+        wrapper.refresh = refresh
+        wrapper.refresh_if_due = refresh_if_due
+        wrapper.clear = clear
+        return wrapper
+    return decorator
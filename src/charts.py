@@ -0,0 +1,175 @@
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+import laps
+import tracing
+
+# Points above which charts are drawn with WebGL instead of SVG
+WEBGL_THRESHOLD = 1000
+# Points above which charts are downsampled, bounding the figure payload
+MAX_POINTS = 2000
+
+##############################
+# Downsampling
+##############################
+
+def lttb(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets downsampling of a series sorted by `x`.
+    Returns the indices of the `threshold` points that best preserve its shape.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    size = len(x)
+    if threshold >= size or threshold < 3:
+        return np.arange(size)
+
+    # The first and last points are always kept, the others are split in buckets
+    edges = np.linspace(1, size - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, size - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else size
+        next_x, next_y = x[end:next_end].mean(), y[end:next_end].mean()
+        # Keep the point forming the largest triangle with the previous kept point
+        # and the average of the next bucket
+        area = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(area))
+        selected[bucket + 1] = previous
+    return selected
+
+def downsample(df, x, y, group=None, max_points=MAX_POINTS):
+    """
+    Downsamples every series of `df` (one per `group` value) with LTTB, sharing
+    `max_points` between them in proportion to their length.
+    """
+    if len(df) <= max_points:
+        return df
+    groups = [df] if group is None else [series for _, series in df.groupby(group, sort=False)]
+    kept = []
+    for series in groups:
+        series = series.sort_values(x, kind="stable")
+        budget = max(3, max_points * len(series) // len(df))
+        kept.append(series.iloc[lttb(series[x].to_numpy(), series[y].to_numpy(), budget)])
+    return pd.concat(kept)
+
+##############################
+# Figures
+##############################
+
+@tracing.traced("render")
+def lap_time_chart(df, color=None):
+    """
+    Scatter plot of lap times against lap numbers, optionally coloured by `color`.
+
+    Lap times are shown on hover rather than as labels on every point. Above
+    `WEBGL_THRESHOLD` points the figure is drawn with WebGL, and above
+    `MAX_POINTS` every series is downsampled so the payload stays bounded.
+    """
+    columns = ["lap", "milliseconds"] + ([color] if color else [])
+    points = downsample(df[columns], "lap", "milliseconds", group=color)
+    points = points.assign(formatted_time=laps.format_times(points["milliseconds"]))
+
+    fig = px.scatter(
+        points,
+        x="lap",
+        y="milliseconds",
+        labels={"lap": "Lap Number", "milliseconds": "Time", "formatted_time": "Time", "race.year": "Year"},
+        hover_data={"milliseconds": False, "formatted_time": True},
+        color=color,
+        render_mode="webgl" if len(df) > WEBGL_THRESHOLD else "svg",
+    )
+    fig.update_traces(mode="markers")
+    tickvals, ticktext = laps.time_ticks(points["milliseconds"].max())
+    fig.update_yaxes(tickmode="array", tickvals=tickvals, ticktext=ticktext)
+    if len(points) < len(df):
+        fig.update_layout(title_text=f"{len(points):,} of {len(df):,} laps shown, downsampled to preserve their shape", title_font_size=12)
+    return fig
+
+##############################
+# Pace analysis
+##############################
+
+@tracing.traced("render")
+def pace_trend_chart(races):
+    """
+    Median and best clean lap of every race, from `pace.analyze`, in race order.
+    """
+    df = pd.DataFrame({
+        "race": np.arange(1, len(races["race_id"]) + 1),
+        "year": races["year"],
+        "Median": races["median"],
+        "Best": races["best"],
+    }).melt(id_vars=["race", "year"], var_name="lap", value_name="milliseconds")
+    df = df.assign(formatted_time=laps.format_times(df["milliseconds"]))
+    fig = px.line(
+        df,
+        x="race",
+        y="milliseconds",
+        color="lap",
+        markers=True,
+        labels={"race": "Race", "milliseconds": "Time", "formatted_time": "Time", "year": "Year", "lap": "Clean lap"},
+        hover_data={"milliseconds": False, "race": False, "year": True, "formatted_time": True},
+    )
+    tickvals, ticktext = laps.time_ticks(df["milliseconds"].max())
+    fig.update_yaxes(tickmode="array", tickvals=tickvals, ticktext=ticktext, range=[df["milliseconds"].min() * 0.99, df["milliseconds"].max() * 1.01])
+    return fig
+
+@tracing.traced("render")
+def rolling_pace_chart(df, rolling, color=None):
+    """
+    Rolling pace of every lap against the lap number, one line per race
+    coloured by `color`, downsampled like `lap_time_chart`.
+    """
+    points = df[["raceId", "lap"] + ([color] if color else [])].assign(milliseconds=rolling).dropna(subset=["milliseconds"])
+    points = downsample(points, "lap", "milliseconds", group="raceId")
+    points = points.assign(formatted_time=laps.format_times(points["milliseconds"]))
+    fig = px.line(
+        points,
+        x="lap",
+        y="milliseconds",
+        color=color,
+        line_group="raceId",
+        labels={"lap": "Lap Number", "milliseconds": "Rolling pace", "formatted_time": "Rolling pace", "race.year": "Year"},
+        hover_data={"raceId": False, "milliseconds": False, "formatted_time": True},
+        render_mode="webgl" if len(points) > WEBGL_THRESHOLD else "svg",
+    )
+    tickvals, ticktext = laps.time_ticks(points["milliseconds"].max())
+    fig.update_yaxes(tickmode="array", tickvals=tickvals, ticktext=ticktext, range=[points["milliseconds"].min() * 0.99, points["milliseconds"].max() * 1.01])
+    return fig
+
+@tracing.traced("render")
+def histogram_chart(histogram):
+    """
+    Distribution of the clean laps' deltas to their race median, binned by `pace.analyze`.
+    """
+    edges = histogram["edges"]
+    fig = px.bar(
+        x=(edges[:-1] + edges[1:]) / 2,
+        y=histogram["counts"],
+        labels={"x": "Delta to race median (%)", "y": "Laps"},
+    )
+    fig.update_traces(width=edges[1] - edges[0])
+    fig.update_layout(bargap=0)
+    return fig
+
+@tracing.traced("render")
+def heatmap_chart(heatmap):
+    """
+    Share of every year's clean laps per delta bin, binned by `pace.analyze`.
+    """
+    edges = heatmap["edges"]
+    return px.imshow(
+        heatmap["share"],
+        x=(edges[:-1] + edges[1:]) / 2,
+        y=[str(year) for year in heatmap["years"]],
+        labels={"x": "Delta to race median (%)", "y": "Year", "color": "Share of laps (%)"},
+        aspect="auto",
+        color_continuous_scale="Viridis",
+    )
@@ -3,8 +3,28 @@ import logging
 import streamlit as st
 from pathlib import Path
 
+import api
+import cache
+import export
+import gate
+import tracing
+import warmer
+
 logo_path = os.path.join(os.path.abspath(os.getcwd()), "src/resources", "logo.png")
 
+# Modules are imported once per process, unlike the page scripts rerun on every interaction
+pil_logger = logging.getLogger("PIL")
+pil_logger.setLevel(logging.INFO)
+
+@st.cache_resource(show_spinner=False)
+def load_logo():
+    """
+    Returns the logo's bytes, read once per process, or None without a logo.
+    """
+    if os.path.exists(logo_path):
+        return Path(logo_path).read_bytes()
+    return None
+
 def print_menu():
     st.set_page_config(
         page_title="VPS - Data Viewer",
@@ -17,13 +37,13 @@ def print_menu():
     Prints the logo at the top of the Streamlit sidebar.
     """
 
-    pil_logger = logging.getLogger("PIL")
-    pil_logger.setLevel(logging.INFO)
+    # keep the shared caches warm, started once per server process
+    cache_warmer = warmer.start()
 
     # draw the app header
-    if os.path.exists(logo_path):
+    image = load_logo()
+    if image:
         col_icon, col_title = st.sidebar.columns([1.3, 2])
-        image = Path(logo_path).read_bytes()
         col_icon.markdown("<br>", unsafe_allow_html=True)
         col_icon.image(image, use_column_width=True)
         col_title.header('Vehicle Performance Software')
@@ -42,3 +62,126 @@ def print_menu():
         st.header("Drivers")
         st.page_link("pages/drivers.py", label="Drivers", icon="👨‍🚀")
         st.page_link("pages/driver_performance.py", label="Driver Performance", icon="🕒")
+        st.divider()
+        show_timings = st.toggle("⏱️ Show timings", key="show_timings", help="Time API calls, decoding, data transforms and chart rendering")
+
+    # draw the opt-in timing panel
+    if show_timings:
+        tracing.print_panel(tracing.begin_run())
+        warmer.print_status(cache_warmer)
+        gate.print_status(api.outbound_gate())
+        cache.print_status()
+    else:
+        tracing.end_session()
+
+def print_request_error(error):
+    # Show the API's own message when it rejected the request
+    st.error(f"Failed to fetch data. Please try again. {error.response.text if error.response is not None else error}")
+
+def print_custom_query(path, sort_columns, file_name, filter_example, columns_example):
+    """
+    Prints the custom query form of a paginated endpoint and its results,
+    fetched from the API or queried locally, and exports every matching
+    record to `file_name`.csv or .parquet.
+    """
+    with st.form("query_form"):
+        qc1, qc2, qc3, qc4 = st.columns([0.5, 0.75, 1, 0.5])
+        with qc1:
+            page = st.number_input("Page", min_value=1, value=1, help="Page number to fetch")
+        with qc2:
+            pageSize = st.number_input("Page Size", min_value=1, max_value=1000, value=10, help="Number of records per page (range: 1-1000)")
+        with qc3:
+            sort = st.selectbox("Sort by column", ["", *sort_columns], help="Column to sort by")
+        with qc4:
+            order = st.selectbox("Order", ["asc", "desc"], help="Sort order")
+
+        custom_filter_query = st.text_input("Custom filter query", help=f"Enter multiple custom LINQ supported query, comma-separated (eg: `{filter_example}`)")
+        keep_columns = st.text_input("Columns to keep", help=f"Enter column names to keep, comma-separated (eg: `{columns_example}`)")
+        local_mode = st.toggle("Local mode", help="Load the full table once and run queries locally, without calling the API again")
+        bc1, bc2, bc3 = st.columns([1, 0.5, 0.75])
+        with bc1:
+            submit_button = st.form_submit_button("Submit Query")
+        with bc2:
+            export_format = st.selectbox("Export format", list(export.FORMATS), label_visibility="collapsed", help="Format of the exported file")
+        with bc3:
+            export_button = st.form_submit_button("⬇️ Export all pages", help="Export every record matching the query, not only the current page")
+
+    # The query modules load pandas, they are only imported once a query is submitted
+    if submit_button or export_button:
+        import frames
+        import query
+
+    if submit_button and local_mode:
+        # Run the query against the locally cached table
+        try:
+            with st.spinner("Loading the full table..."):
+                table = query.load_table(path)
+            metadata, df = query.run(table, custom_filter_query, sort, order, page, pageSize, keep_columns)
+        except api.RequestException as error:
+            print_request_error(error)
+            return
+        except ValueError as error:
+            st.error(f"Invalid query. {error}")
+            return
+
+        # Collapsible section to display metadata as json
+        with st.expander("ℹ️ Metadata", expanded=False):
+            st.json(metadata)
+        st.dataframe(frames.compact(df), hide_index=True, use_container_width=True)
+    elif submit_button:
+        # Construct the query parameters
+        params = {"page": page, "pageSize": pageSize}
+        if custom_filter_query:
+            params["filter"] = custom_filter_query
+        if sort:
+            params["sort"] = sort
+        if order:
+            params["order"] = order
+
+        # Fetch data from the API, the next page being prefetched in the background
+        try:
+            response = query.get_page(path, params)
+        except api.RequestException as error:
+            print_request_error(error)
+            return
+
+        metadata = response["_metadata"]
+        # Collapsible section to display metadata as json
+        with st.expander("ℹ️ Metadata", expanded=False):
+            st.json(metadata)
+
+        data = response["records"]
+        # Convert the data to a flat DataFrame and display it
+        df = frames.flatten(data)
+        if keep_columns:
+            try:
+                df = query.project(df, keep_columns)
+            except ValueError as error:
+                st.error(f"Invalid query. {error}")
+                return
+        st.dataframe(frames.compact(df), hide_index=True, use_container_width=True)
+
+    if export_button:
+        # Stream every matching record to a file, one page at a time
+        try:
+            with st.spinner("Exporting every matching record..."):
+                if local_mode:
+                    chunks = export.local_chunks(query.load_table(path), custom_filter_query, sort, order, keep_columns)
+                else:
+                    chunks = export.api_chunks(path, custom_filter_query, sort, order, keep_columns)
+                file, rows = export.write(chunks, export_format)
+        except api.RequestException as error:
+            print_request_error(error)
+            return
+        except export.ExportError as error:
+            st.error(f"Failed to export the records. {error}")
+            return
+        except ValueError as error:
+            st.error(f"Invalid query. {error}")
+            return
+
+        if rows:
+            extension, mime = export.FORMATS[export_format]
+            st.download_button(f"💾 Download {rows:,} records", file, file_name=f"{file_name}.{extension}", mime=mime)
+        else:
+            st.warning("No records match the query.")
@@ -0,0 +1,120 @@
+import os
+import tempfile
+
+import api
+import tracing
+
+# pandas and pyarrow are imported where they are needed, as pages read the
+# export formats on their first render
+
+# Export formats, name: (file extension, MIME type)
+FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+# Rows written at once when exporting a locally queried table
+CHUNK_SIZE = 1000
+
+# Raised when the records can't be written in the chosen format
+class ExportError(Exception):
+    pass
+
+##############################
+# Chunk sources
+##############################
+
+def api_chunks(path, filter_query="", sort="", order="asc", keep_columns=""):
+    """
+    Yields every record of a query to a paginated endpoint as flat DataFrames,
+    one page at a time, projected on `keep_columns`.
+    """
+    import frames
+    import query
+
+    params = {"filter": filter_query, "sort": sort, "order": order}
+    for records in api.stream_pages(path, {key: value for key, value in params.items() if value}):
+        df = frames.flatten(records)
+        yield query.project(df, keep_columns) if keep_columns else df
+
+def local_chunks(table, filter_query="", sort="", order="asc", keep_columns=""):
+    """
+    Yields every row of a local query against a table from `query.load_table`,
+    `CHUNK_SIZE` rows at a time, projected on `keep_columns`.
+    """
+    import query
+
+    positions = query.select(table, filter_query, sort, order)
+    table = query.project(table, keep_columns) if keep_columns else table
+    for start in range(0, len(positions), CHUNK_SIZE):
+        yield table.take(positions[start:start + CHUNK_SIZE])
+
+##############################
+# Writers
+##############################
+
+# Columns may first appear, or first hold values, in any chunk: chunks are
+# spooled to disk while their columns are merged, then written out
+def _spool(chunks, directory, paths):
+    for df in chunks:
+        path = os.path.join(directory, f"{len(paths)}.pkl")
+        df.to_pickle(path)
+        paths.append(path)
+        yield df
+
+def _unspool(paths):
+    import pandas as pd
+
+    for path in paths:
+        yield pd.read_pickle(path)
+
+def _write_csv(chunks, file):
+    with tempfile.TemporaryDirectory() as directory:
+        paths, columns = [], {}
+        for df in _spool(chunks, directory, paths):
+            columns.update(dict.fromkeys(df.columns))
+        for number, df in enumerate(_unspool(paths)):
+            file.write(df.reindex(columns=list(columns)).to_csv(header=number == 0, index=False).encode())
+
+def _write_parquet(chunks, file):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths, schemas = [], []
+        try:
+            for df in _spool(chunks, directory, paths):
+                schemas.append(pa.Schema.from_pandas(df, preserve_index=False))
+            if not schemas:
+                return
+            # Integers widen to floats, and columns without values take the type they have in other chunks
+            schema = pa.unify_schemas(schemas, promote_options="permissive")
+            # Columns without any value are assumed to hold strings
+            schema = pa.schema([field.with_type(pa.string()) if pa.types.is_null(field.type) else field for field in schema])
+            with pq.ParquetWriter(file, schema) as writer:
+                for df in _unspool(paths):
+                    writer.write_table(pa.Table.from_pandas(df.reindex(columns=schema.names), schema=schema, preserve_index=False))
+        except pa.ArrowException as error:
+            raise ExportError(f"The records don't fit a single Parquet schema. {error}") from None
+
+@tracing.traced("transform", "export")
+def write(chunks, file_format):
+    """
+    Writes DataFrame chunks to a temporary CSV or Parquet file, only one chunk
+    being held in memory at a time. Columns are those of every chunk, in order
+    of appearance. Returns the file, rewound, and the number of rows written.
+    Raises ExportError when the chunks can't be written in `file_format`.
+    """
+    rows = 0
+
+    def counted():
+        nonlocal rows
+        for df in chunks:
+            rows += len(df)
+            yield df
+
+    # Unbuffered, as st.download_button only reads raw or in-memory files
+    file = tempfile.TemporaryFile(buffering=0)
+    writer = _write_parquet if file_format == "Parquet" else _write_csv
+    writer(counted(), file)
+    file.seek(0)
+    return file, rows
@@ -0,0 +1,71 @@
+import re
+import pandas as pd
+
+import tracing
+
+@tracing.traced("transform", "flatten")
+def flatten(records, sep="."):
+    """
+    Builds a DataFrame from API records, expanding nested objects into
+    `sep` separated scalar columns (eg: `race.circuit.name`).
+
+    Each nested level is converted column-wise in a single pass, which is
+    considerably cheaper than `pd.json_normalize` on large result sets.
+    """
+    return _flatten(records, sep)
+
+def _flatten(records, sep):
+    df = pd.DataFrame(records)
+    for column in list(df.columns):
+        values = df[column]
+        first = values.first_valid_index()
+        if first is None or not isinstance(values[first], dict):
+            continue
+        nested = _flatten([value if isinstance(value, dict) else {} for value in values], sep)
+        nested.columns = [f"{column}{sep}{name}" for name in nested.columns]
+        df = pd.concat([df.drop(columns=column), nested.set_index(df.index)], axis=1)
+    return df
+
+# ISO 8601 dates, as returned by the API (eg: `2023-03-05T00:00:00`)
+ISO_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}(T\d{2}:\d{2}(:\d{2}(\.\d+)?)?)?$")
+
+def _is_strings(values):
+    return values.dtype == object and values.map(type).isin([str, type(None)]).all()
+
+def _parse_dates(values):
+    # Every distinct date is parsed once, categoricals keeping their codes
+    categorical = isinstance(values.dtype, pd.CategoricalDtype)
+    distinct = values.cat.categories if categorical else pd.Index(values.dropna().unique())
+    if distinct.empty or not all(ISO_DATE.match(value) for value in distinct[:10]):
+        return None
+    try:
+        dates = pd.to_datetime(distinct, format="ISO8601")
+    except (ValueError, TypeError):
+        return None
+    if categorical:
+        return pd.Series(dates.take(values.cat.codes.to_numpy(), allow_fill=True), index=values.index, name=values.name)
+    return values.map(dict(zip(distinct, dates))).astype(dates.dtype)
+
+@tracing.traced("transform", "compact")
+def compact(df):
+    """
+    Shrinks a flat DataFrame before it is displayed: integers are downcast to
+    the smallest type holding them, ISO dates are parsed, and strings repeated
+    across rows become categoricals. Arrow serializes such columns far more
+    compactly than generic object columns.
+    """
+    df = df.copy()
+    for column in df.columns:
+        values = df[column]
+        if pd.api.types.is_integer_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            df[column] = pd.to_numeric(values, downcast="integer")
+        elif isinstance(values.dtype, pd.CategoricalDtype) or _is_strings(values):
+            dates = _parse_dates(values)
+            if dates is not None:
+                df[column] = dates
+            elif isinstance(values.dtype, pd.CategoricalDtype):
+                # Pages of a larger table only carry the categories they use
+                df[column] = values.cat.remove_unused_categories()
+            elif values.nunique() <= len(values) // 2:
+                df[column] = values.astype("category")
+    return df
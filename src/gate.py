@@ -0,0 +1,226 @@
+import re
+import math
+import time
+import threading
+import requests
+import streamlit as st
+
+# Smoothing of the recent and baseline latency averages
+SHORT_SMOOTHING = 0.2
+LONG_SMOOTHING = 0.01
+# Share of the limit kept when a request fails
+DECREASE_FACTOR = 0.5
+
+# Requests refused by the gate raise these, both being RequestExceptions so
+# callers handling an unavailable API handle a degraded one the same way
+class Rejected(requests.RequestException):
+    pass
+
+class Overloaded(Rejected):
+    pass
+
+class CircuitOpen(Rejected):
+    pass
+
+def endpoint(path):
+    """
+    Returns the endpoint of a path, ids being replaced by a placeholder
+    (eg: `/races/lapTimes/1` is `/races/lapTimes/{id}`).
+    """
+    return re.sub(r"/\d+(?=/|$)", "/{id}", path)
+
+##############################
+# Adaptive concurrency limit
+##############################
+
+class AdaptiveLimiter:
+    """
+    Limits the requests in flight to the API, the limit adapting to their
+    latency with a gradient: while the recent latency stays within `tolerance`
+    times its long-term baseline the limit grows towards `max_limit`, past it
+    the limit shrinks in proportion, down to `min_limit`. Failed requests cut it.
+    """
+
+    def __init__(self, initial, min_limit, max_limit, tolerance=2.0):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.limit = float(min(max(initial, min_limit), max_limit))
+        self.in_flight = 0
+        self.rejected = 0
+        self.recent = None
+        self.baseline = None
+        self._condition = threading.Condition()
+
+    def acquire(self, timeout):
+        """
+        Waits up to `timeout` seconds for a free slot. Returns False when none freed up.
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.rejected += 1
+                    return False
+                self._condition.wait(remaining)
+            self.in_flight += 1
+            return True
+
+    def release(self, latency, ok):
+        with self._condition:
+            self.in_flight -= 1
+            if ok:
+                self._adapt(latency)
+            else:
+                self.limit = max(self.min_limit, self.limit * DECREASE_FACTOR)
+            self._condition.notify_all()
+
+    def _adapt(self, latency):
+        if self.recent is None:
+            self.recent = self.baseline = latency
+        self.recent += SHORT_SMOOTHING * (latency - self.recent)
+        self.baseline += LONG_SMOOTHING * (latency - self.baseline)
+        # A baseline far below a lasting latency increase slowly catches up with it
+        if self.recent > self.baseline * self.tolerance * 2:
+            self.baseline *= 1.05
+        gradient = max(0.5, min(1.0, self.tolerance * self.baseline / self.recent))
+        # The square root lets the limit grow, and allows a small queue at steady state
+        target = self.limit * gradient + math.sqrt(self.limit)
+        self.limit = min(self.max_limit, max(self.min_limit, 0.8 * self.limit + 0.2 * target))
+
+##############################
+# Circuit breaking
+##############################
+
+class CircuitBreaker:
+    """
+    Stops sending requests to an endpoint after `threshold` consecutive
+    failures. After `cooldown` seconds a single trial request is let through:
+    the circuit closes again when it succeeds and stays open when it fails.
+    """
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = "half-open"
+            if self.state == "half-open" and not self._trial:
+                self._trial = True
+                return True
+            return self.state == "closed"
+
+    def retry_in(self):
+        return max(0, self.cooldown - (time.monotonic() - self.opened_at)) if self.opened_at else 0
+
+    def cancel(self):
+        # A trial request that was never sent
+        with self._lock:
+            self._trial = False
+
+    def success(self):
+        with self._lock:
+            self.state, self.failures, self.opened_at, self._trial = "closed", 0, None, False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half-open" or self.failures >= self.threshold:
+                self.state, self.opened_at, self._trial = "open", time.monotonic(), False
+
+##############################
+# Gate
+##############################
+
+class Gate:
+    """
+    Process-wide gate of the outbound requests: one adaptive concurrency limit
+    shared by every endpoint, and a circuit breaker per endpoint. Requests
+    are refused at once while their endpoint's circuit is open, and after
+    waiting `queue_timeout` seconds for a slot, so a degraded API can't tie
+    up every thread of the server.
+    """
+
+    def __init__(self, limiter, threshold, cooldown, queue_timeout):
+        self.limiter = limiter
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.queue_timeout = queue_timeout
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, name):
+        with self._lock:
+            breaker = self._breakers.get(name)
+            if breaker is None:
+                breaker = self._breakers[name] = CircuitBreaker(self.threshold, self.cooldown)
+            return breaker
+
+    def call(self, name, send):
+        """
+        Sends a request with `send()` through the gate, the request counting as
+        failed when it raises or gets a 5xx response. Returns the response.
+        Raises CircuitOpen or Overloaded when the request is refused.
+        """
+        breaker = self.breaker(name)
+        if not breaker.allow():
+            raise CircuitOpen(f"The API is failing on {name}, retrying in {breaker.retry_in():.0f}s")
+        if not self.limiter.acquire(self.queue_timeout):
+            breaker.cancel()
+            raise Overloaded(f"Too many requests in flight to the API ({int(self.limiter.limit)})")
+
+        start, ok = time.monotonic(), False
+        try:
+            response = send()
+            ok = response.status_code < 500
+            return response
+        finally:
+            self.limiter.release(time.monotonic() - start, ok)
+            if ok:
+                breaker.success()
+            else:
+                breaker.failure()
+
+    def status(self):
+        """
+        Returns the concurrency limit figures and the state of every endpoint's circuit.
+        """
+        limiter = self.limiter
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {
+            "limit": limiter.limit,
+            "in_flight": limiter.in_flight,
+            "rejected": limiter.rejected,
+            "recent_ms": limiter.recent * 1000 if limiter.recent is not None else None,
+            "baseline_ms": limiter.baseline * 1000 if limiter.baseline is not None else None,
+            "endpoints": [
+                {"endpoint": name, "state": breaker.state, "failures": breaker.failures,
+                 "retry_in": round(breaker.retry_in()) if breaker.state != "closed" else None}
+                for name, breaker in sorted(breakers.items())
+            ],
+        }
+
+##############################
+# Status panel
+##############################
+
+def print_status(gate):
+    """
+    Prints the concurrency limit and circuit states in the sidebar.
+    """
+    status = gate.status()
+    with st.sidebar.expander("🚦 API gate", expanded=False):
+        st.caption(
+            f"Concurrency limit {status['limit']:.1f}, {status['in_flight']} in flight, {status['rejected']} rejected"
+            + (f", latency {status['recent_ms']:,.0f} ms (baseline {status['baseline_ms']:,.0f} ms)" if status["recent_ms"] is not None else "")
+        )
+        st.dataframe(status["endpoints"], hide_index=True, use_container_width=True)
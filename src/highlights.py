@@ -0,0 +1,37 @@
+from datetime import datetime
+
+import api
+import cache
+
+##############################
+# Headline figures
+##############################
+
+def _get(path, params=None):
+    # The figures are optional, an unavailable API only hides them
+    try:
+        response = api.get(path, params=params)
+    except api.RequestException:
+        return None
+    return api.decode(response) if response.status_code == 200 else None
+
+@cache.swr(ttl=300)
+def get_metrics():
+    return _get("/database/metrics")
+
+@cache.swr(ttl=300)
+def get_next_race():
+    # Get todays date in the format YYYY-MM-DD
+    today = datetime.today().strftime('%Y-%m-%d')
+    page = _get("/races", params={"pageSize": 1, "filter": f"date>{today}", "sort": "date", "order": "asc"})
+    return page["records"][0] if page and page["records"] else None
+
+@cache.swr(ttl=300)
+def driver_with_most_points():
+    page = _get("/drivers/standings", params={"pageSize": 1, "sort": "points", "order": "dsc"})
+    return page["records"][0] if page and page["records"] else None
+
+@cache.swr(ttl=300)
+def driver_with_most_wins():
+    page = _get("/drivers/standings", params={"pageSize": 1, "sort": "wins", "order": "dsc"})
+    return page["records"][0] if page and page["records"] else None
@@ -0,0 +1,289 @@
+import json
+import time
+import functools
+
+from contextlib import closing
+
+import api
+import cache
+import store
+import tracing
+
+# pandas and the modules using it are imported by the queries, the cache warmer
+# importing this module on startup only to sync the store
+
+# Seconds between two syncs of the store with the API
+SYNC_INTERVAL = 10 * 60
+
+# Percentiles of the lap time aggregates, column: quantile
+PERCENTILES = {"p10": 0.1, "p25": 0.25, "p75": 0.75, "p90": 0.9}
+
+# Every lap of the drivers recently queried, prefetched for their next queries
+_driver_laps = cache.Prefetcher("driver laps", cache.budget("lap_cache_bytes"), ttl=SYNC_INTERVAL)
+
+##############################
+# On-disk store
+##############################
+
+def _connect():
+    return store.connect("laps.sqlite3", """
+        CREATE TABLE IF NOT EXISTS races (
+            raceId INTEGER PRIMARY KEY,
+            year INTEGER NOT NULL,
+            circuitId INTEGER NOT NULL,
+            body TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS laps (
+            driverId INTEGER NOT NULL,
+            raceId INTEGER NOT NULL,
+            lap INTEGER NOT NULL,
+            position INTEGER,
+            time TEXT,
+            milliseconds INTEGER NOT NULL,
+            PRIMARY KEY (driverId, raceId, lap)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS lap_stats (
+            driverId INTEGER NOT NULL,
+            circuitId INTEGER NOT NULL,
+            year INTEGER NOT NULL,
+            laps INTEGER NOT NULL,
+            max_lap INTEGER NOT NULL,
+            mean REAL NOT NULL,
+            median REAL NOT NULL,
+            best INTEGER NOT NULL,
+            p10 REAL NOT NULL,
+            p25 REAL NOT NULL,
+            p75 REAL NOT NULL,
+            p90 REAL NOT NULL,
+            PRIMARY KEY (driverId, circuitId, year)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS sync (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            high_water_mark INTEGER NOT NULL,
+            synced_at REAL NOT NULL
+        );
+    """)
+
+def high_water_mark():
+    """
+    Returns the newest raceId whose lap times are stored, 0 when the store is empty.
+    """
+    with closing(_connect()) as connection:
+        row = connection.execute("SELECT high_water_mark FROM sync").fetchone()
+    return row[0] if row else 0
+
+##############################
+# Sync
+##############################
+
+@tracing.traced("api", "lap time sync")
+def sync():
+    """
+    Stores the lap times of every race newer than the high-water mark, the
+    lap times of a past race never changing. The first sync loads the whole
+    history, later ones only the races added since. Pages are written as
+    they arrive, in the same transaction as the aggregates and the mark, so
+    queries never see laps without their aggregates and an interrupted sync
+    is started over by the next one. Returns the new mark.
+    """
+    mark = newest = high_water_mark()
+    # A fixed order keeps the page boundaries stable between requests, and only
+    # a bounded window of pages is held in memory however long the history
+    params = {"filter": f"raceId>{mark}", "sort": "raceId"}
+    with closing(_connect()) as connection, connection:
+        for records in api.stream_pages("/races/lapTimes", params=params):
+            if records:
+                newest = max(newest, *_insert(connection, records))
+        # Aggregates missing from a store synced before they existed are built from scratch
+        built = connection.execute("SELECT 1 FROM lap_stats LIMIT 1").fetchone()
+        _update_stats(connection, mark if built else 0)
+        connection.execute("INSERT OR REPLACE INTO sync VALUES (1, ?, ?)", (newest, time.time()))
+    return newest
+
+def _insert(connection, records):
+    """
+    Stores lap time records of `/races/lapTimes` and their races. Returns the raceIds.
+    """
+    races = {record["raceId"]: record["race"] for record in records}
+    connection.executemany(
+        "INSERT OR REPLACE INTO races VALUES (?, ?, ?, ?)",
+        [(race_id, race["year"], race["circuitId"], json.dumps(race)) for race_id, race in races.items()],
+    )
+    connection.executemany(
+        "INSERT OR REPLACE INTO laps VALUES (?, ?, ?, ?, ?, ?)",
+        [(record["driverId"], record["raceId"], record["lap"], record["position"], record["time"], record["milliseconds"]) for record in records],
+    )
+    return races
+
+@tracing.traced("transform", "lap time aggregates")
+def _update_stats(connection, since):
+    """
+    Recomputes the lap time aggregates of every driver, circuit and year that
+    had a race newer than raceId `since`, the whole cube when 0. Medians and
+    percentiles can't be merged, so the touched groups are rebuilt from
+    their stored laps with a single vectorized group-by.
+    """
+    import pandas as pd
+
+    df = pd.read_sql_query(
+        """
+        SELECT laps.driverId, races.circuitId, races.year, laps.lap, laps.milliseconds
+        FROM laps JOIN races USING (raceId)
+        WHERE (races.circuitId, races.year) IN (SELECT circuitId, year FROM races WHERE raceId > ?)
+        """,
+        connection, params=(since,),
+    )
+    if df.empty:
+        return
+    grouped = df.groupby(["driverId", "circuitId", "year"])
+    stats = grouped["milliseconds"].agg(laps="count", mean="mean", median="median", best="min")
+    stats.insert(1, "max_lap", grouped["lap"].max())
+    percentiles = grouped["milliseconds"].quantile(list(PERCENTILES.values())).unstack()
+    percentiles.columns = list(PERCENTILES)
+    rows = stats.join(percentiles).reset_index().astype(object)
+    connection.executemany(
+        f"INSERT OR REPLACE INTO lap_stats ({', '.join(rows.columns)}) VALUES ({', '.join('?' * len(rows.columns))})",
+        rows.itertuples(index=False, name=None),
+    )
+
+@cache.swr(ttl=SYNC_INTERVAL)
+def synced():
+    """
+    Syncs the store at most every `SYNC_INTERVAL` seconds, in the background
+    once it has been loaded. Returns the high-water mark, or None when the
+    API is unavailable, the stored lap times being served as they are.
+    """
+    try:
+        return sync()
+    except api.RequestException:
+        return None
+
+def ready():
+    """
+    Syncs the store when due, in the background once it has been loaded so an
+    unavailable API doesn't hold up the queries. Returns False when it was
+    never loaded and the API is unavailable, nothing can be served then.
+    """
+    if high_water_mark() > 0:
+        synced.refresh_if_due()
+        return True
+    return synced() is not None
+
+##############################
+# Queries
+##############################
+
+def _where(driver_ids, circuit_id=None, year=None, laps="laps", races="races"):
+    clauses = [f"{laps}.driverId IN ({', '.join('?' * len(driver_ids))})"]
+    params = list(driver_ids)
+    if circuit_id is not None:
+        clauses.append(f"{races}.circuitId = ?")
+        params.append(circuit_id)
+    if year:
+        clauses.append(f"{races}.year = ?")
+        params.append(int(year))
+    return " AND ".join(clauses), params
+
+def _query_lap_times(driver_id, circuit_id=None, year=None):
+    import pandas as pd
+    import frames
+
+    where, params = _where([driver_id], circuit_id, year)
+    with closing(_connect()) as connection:
+        df = pd.read_sql_query(
+            f"SELECT laps.* FROM laps JOIN races USING (raceId) WHERE {where} ORDER BY races.year, laps.raceId, laps.lap",
+            connection, params=params,
+        )
+        race_ids = df["raceId"].unique().tolist()
+        bodies = connection.execute(
+            f"SELECT body FROM races WHERE raceId IN ({', '.join('?' * len(race_ids))})", race_ids
+        ).fetchall()
+    if df.empty:
+        return df
+    races = frames.flatten([json.loads(body) for body, in bodies])
+    races.columns = [f"race.{column}" for column in races.columns]
+    return df.merge(races, left_on="raceId", right_on="race.raceId", how="left")
+
+@tracing.traced("transform", "stored lap times")
+def get_lap_times(driver_id, circuit_id=None, year=None):
+    """
+    Returns the stored laps of a driver as a flat DataFrame, in the shape of
+    `/races/lapTimes` with nested race and circuit details expanded into dotted
+    columns (eg: `race.year`). Laps prefetched by `prefetch_lap_times` are
+    filtered in memory. Raises ValueError on an invalid year.
+    """
+    import numpy as np
+
+    df = _driver_laps.get(driver_id)
+    if df is None:
+        return _query_lap_times(driver_id, circuit_id, year)
+    mask = np.ones(len(df), dtype=bool)
+    if circuit_id is not None and not df.empty:
+        mask &= df["race.circuitId"].to_numpy() == circuit_id
+    if year and not df.empty:
+        mask &= df["race.year"].to_numpy() == int(year)
+    return df[mask].reset_index(drop=True)
+
+def prefetch_lap_times(driver_id):
+    """
+    Loads every lap of a driver in the background, so their next queries on
+    other circuits or years don't go back to the store.
+    """
+    _driver_laps.prefetch(driver_id, functools.partial(_query_lap_times, driver_id))
+
+##############################
+# Aggregates
+##############################
+
+def get_lap_summary(driver_id, circuit_id=None, year=None):
+    """
+    Returns the lap count, year of the fastest lap and the fastest and mean lap
+    times in milliseconds of a driver, looked up in the aggregates. The lap
+    count is the number of distinct lap numbers, ie: the longest race.
+    Returns None without laps. Raises ValueError on an invalid year.
+    """
+    where, params = _where([driver_id], circuit_id, year, laps="lap_stats", races="lap_stats")
+    with closing(_connect()) as connection:
+        # The year of the fastest lap comes from the row holding it, earliest on a tie
+        row = connection.execute(
+            f"""
+            SELECT MAX(max_lap), MIN(best),
+                (SELECT year FROM lap_stats WHERE {where} ORDER BY best, year LIMIT 1),
+                SUM(mean * laps) / SUM(laps)
+            FROM lap_stats WHERE {where}
+            """,
+            params + params,
+        ).fetchone()
+    if row[0] is None:
+        return None
+    return dict(zip(["laps", "fastest", "fastest_year", "mean"], row))
+
+@tracing.traced("transform", "stored lap summaries")
+def get_lap_summaries(driver_ids, year=None):
+    """
+    Returns the per-circuit `meanTime`/`fastestTime` summary of every driver
+    looked up in the aggregates, in the shape of `/races/lapTimes/{driverId}`.
+    Returns a dict of driverId to summary records. Raises ValueError on an invalid year.
+    """
+    import laps
+
+    driver_ids = list(driver_ids)
+    where, params = _where(driver_ids, year=year, laps="lap_stats", races="lap_stats")
+    with closing(_connect()) as connection:
+        rows = connection.execute(
+            f"""
+            SELECT driverId, SUM(mean * laps) / SUM(laps), MIN(best),
+                (SELECT body FROM races WHERE races.circuitId = lap_stats.circuitId LIMIT 1)
+            FROM lap_stats WHERE {where}
+            GROUP BY driverId, circuitId
+            """,
+            params,
+        ).fetchall()
+    summaries = {driver_id: [] for driver_id in driver_ids}
+    for driver_id, mean, fastest, body in rows:
+        summaries[driver_id].append({
+            "circuit": json.loads(body)["circuit"],
+            "meanTime": laps.format_time(round(mean)),
+            "fastestTime": laps.format_time(fastest),
+        })
+    return summaries
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+import tracing
+
+##############################
+# Lap time comparison
+##############################
+
+SUMMARY_COLUMNS = ["meanTime", "fastestTime"]
+
+@tracing.traced("transform")
+def comparison_table(summaries, labels):
+    """
+    Joins lap summaries into a single table with one row per track and a
+    `meanTime`/`fastestTime` column pair per driver. `labels` maps each
+    driverId to the name used in the column headers.
+    """
+    frames = []
+    for driver_id, records in summaries.items():
+        if not records:
+            continue
+        df = pd.DataFrame(records)
+        df["track"] = df["circuit"].str["name"]
+        df = df.set_index("track")[SUMMARY_COLUMNS]
+        df.columns = [f"{labels[driver_id]} {column}" for column in SUMMARY_COLUMNS]
+        frames.append(df)
+    if not frames:
+        return pd.DataFrame(columns=["track"])
+    return pd.concat(frames, axis=1, join="outer").sort_index().reset_index()
+
+##############################
+# Lap time processing
+##############################
+
+# Convert milliseconds to "minutes:seconds.milliseconds"
+def format_time(milliseconds):
+    minutes, remainder = divmod(int(milliseconds), 60000)
+    seconds, millis = divmod(remainder, 1000)
+    return f"{minutes}:{seconds:02d}.{millis:03d}"
+
+@tracing.traced("transform")
+def format_times(milliseconds):
+    """
+    Vectorized `format_time`, returns a NumPy string array.
+
+    The digits of every lap are written straight into a byte matrix which is
+    then viewed as fixed width strings, one group per number of minute digits.
+    """
+    milliseconds = np.asarray(milliseconds, dtype=np.int64)
+    minutes, remainder = np.divmod(milliseconds, 60000)
+    seconds, millis = np.divmod(remainder, 1000)
+
+    digits = np.ones(len(milliseconds), dtype=np.int64)
+    bound = 10
+    while (minutes >= bound).any():
+        digits += minutes >= bound
+        bound *= 10
+
+    formatted = np.empty(len(milliseconds), dtype=f"U{int(digits.max(initial=1)) + 7}")
+    for width in np.unique(digits):
+        rows = digits == width
+        chars = np.empty((int(rows.sum()), width + 7), dtype=np.uint8)
+        for position in range(width):
+            chars[:, width - 1 - position] = ord("0") + minutes[rows] // 10 ** position % 10
+        chars[:, width] = ord(":")
+        chars[:, width + 1] = ord("0") + seconds[rows] // 10
+        chars[:, width + 2] = ord("0") + seconds[rows] % 10
+        chars[:, width + 3] = ord(".")
+        chars[:, width + 4] = ord("0") + millis[rows] // 100
+        chars[:, width + 5] = ord("0") + millis[rows] // 10 % 10
+        chars[:, width + 6] = ord("0") + millis[rows] % 10
+        formatted[rows] = chars.view(f"S{width + 7}").ravel().astype(f"U{width + 7}")
+    return formatted
+
+def time_ticks(max_milliseconds, step=5000):
+    """
+    Returns the tick values and labels of a lap time axis, one tick every `step` milliseconds.
+    """
+    values = np.arange(int(max_milliseconds) // step + 1, dtype=np.int64) * step
+    return values, format_times(values)
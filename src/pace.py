@@ -0,0 +1,137 @@
+import numpy as np
+
+import tracing
+
+# Laps slower than their race median by this many robust standard deviations are outliers
+OUTLIER_Z = 3.5
+# ...and by at least this share of the median, so a very consistent race doesn't flag normal laps
+MIN_OUTLIER_GAP = 0.02
+# Consecutive slow laps put down to a safety car rather than a pit stop
+SAFETY_CAR_LAPS = 3
+# Laps averaged by the rolling pace
+ROLLING_WINDOW = 5
+# Width of the distribution bins, in percent of the race median, widened past MAX_BINS bins
+BIN_WIDTH = 0.25
+MAX_BINS = 200
+
+# Scales the median absolute deviation to a standard deviation for normal data
+MAD_SCALE = 1.4826
+
+##############################
+# Grouped statistics
+##############################
+
+def _group_medians(values, groups, starts, counts):
+    # Sorting by group then value puts every group's median at a known offset
+    ordered = values[np.lexsort((values, groups))]
+    return (ordered[starts + (counts - 1) // 2] + ordered[starts + counts // 2]) / 2
+
+def _rolling_mean(values, weights, starts, window):
+    # Window sums from cumulative sums, the window never reaching back past the race start
+    sums = np.concatenate(([0.0], np.cumsum(values * weights)))
+    totals = np.concatenate(([0], np.cumsum(weights)))
+    end = np.arange(1, len(values) + 1)
+    begin = np.maximum(end - window, starts)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (sums[end] - sums[begin]) / (totals[end] - totals[begin])
+
+def _run_lengths(mask, new_group):
+    # Length of the run of consecutive True values each position belongs to
+    run_start = mask & (new_group | ~np.concatenate(([False], mask[:-1])))
+    run_id = np.cumsum(run_start) - 1
+    lengths = np.bincount(run_id[mask], minlength=max(int(run_start.sum()), 1))
+    return np.where(mask, lengths[np.maximum(run_id, 0)], 0)
+
+##############################
+# Analysis
+##############################
+
+@tracing.traced("transform", "pace analysis")
+def analyze(race_ids, years, milliseconds, window=ROLLING_WINDOW):
+    """
+    Analyses the pace of a driver over a set of laps in one vectorized pass,
+    the laps of a race being contiguous and in lap order, as returned by
+    `history.get_lap_times`. Returns a dict of NumPy arrays:
+
+    - per lap: `delta` to the race median in percent, `rolling` pace (mean of
+      the clean laps among the race's last `window` laps), and the `pit`, `safety_car` and
+      `clean` masks. Laps slower than the race median by `OUTLIER_Z` robust
+      standard deviations are outliers, runs of `SAFETY_CAR_LAPS` or more of
+      them are put down to a safety car, shorter ones to pit stops.
+    - `races`: `race_id`, `year`, `median`, `sigma` (robust standard
+      deviation), `best` and `clean_laps` of every race, over its clean laps.
+    - `histogram`: `edges` and `counts` of the clean laps' deltas.
+    - `heatmap`: `years`, `edges` and `share` of every year's clean laps per delta bin.
+    """
+    race_ids = np.asarray(race_ids)
+    years = np.asarray(years)
+    milliseconds = np.asarray(milliseconds, dtype=np.float64)
+    size = len(milliseconds)
+
+    new_race = np.ones(size, dtype=bool)
+    new_race[1:] = race_ids[1:] != race_ids[:-1]
+    starts = np.flatnonzero(new_race)
+    counts = np.diff(np.append(starts, size))
+    race = np.cumsum(new_race) - 1
+    lap_start = starts[race]
+
+    # Robust location and spread of every race, unaffected by the slow laps
+    median = _group_medians(milliseconds, race, starts, counts)
+    deviation = np.abs(milliseconds - median[race])
+    sigma = _group_medians(deviation, race, starts, counts) * MAD_SCALE
+    threshold = median + np.maximum(OUTLIER_Z * sigma, MIN_OUTLIER_GAP * median)
+
+    slow = milliseconds > threshold[race]
+    run = _run_lengths(slow, new_race)
+    safety_car = run >= SAFETY_CAR_LAPS
+    pit = slow & ~safety_car
+    clean = ~slow
+
+    delta = (milliseconds / median[race] - 1) * 100
+    rolling = _rolling_mean(milliseconds, clean, lap_start, window)
+
+    # Race figures over the clean laps only, every lap up to the median being clean.
+    # Outliers sort last as infinite times, out of the clean laps' medians
+    clean_laps = np.bincount(race, weights=clean, minlength=len(starts)).astype(np.int64)
+    clean_median = _group_medians(np.where(clean, milliseconds, np.inf), race, starts, clean_laps)
+    clean_deviation = np.where(clean, np.abs(milliseconds - clean_median[race]), np.inf)
+    clean_sigma = _group_medians(clean_deviation, race, starts, clean_laps) * MAD_SCALE
+    best = np.full(len(starts), np.inf)
+    np.minimum.at(best, race[clean], milliseconds[clean])
+
+    histogram, heatmap = _bin(delta[clean], years[clean])
+    return {
+        "delta": delta,
+        "rolling": rolling,
+        "pit": pit,
+        "safety_car": safety_car,
+        "clean": clean,
+        "races": {
+            "race_id": race_ids[starts],
+            "year": years[starts],
+            "median": clean_median,
+            "sigma": clean_sigma,
+            "best": best,
+            "clean_laps": clean_laps,
+        },
+        "histogram": histogram,
+        "heatmap": heatmap,
+    }
+
+def _bin(delta, years):
+    if len(delta) == 0:
+        edges = np.array([0.0, BIN_WIDTH])
+        return {"edges": edges, "counts": np.zeros(1, dtype=np.int64)}, {"years": years[:0], "edges": edges, "share": np.zeros((0, 1))}
+    low, high = float(delta.min()), float(delta.max())
+    width = max(BIN_WIDTH, (high - low) / MAX_BINS)
+    low = np.floor(low / width) * width
+    bins = max(int(np.ceil((high - low) / width)), 1)
+    edges = low + np.arange(bins + 1) * width
+    column = np.minimum(((delta - low) / width).astype(np.int64), bins - 1)
+
+    labels, row = np.unique(years, return_inverse=True)
+    counts = np.bincount(row * bins + column, minlength=len(labels) * bins).reshape(len(labels), bins)
+    return (
+        {"edges": edges, "counts": counts.sum(axis=0)},
+        {"years": labels, "edges": edges, "share": counts / counts.sum(axis=1, keepdims=True) * 100},
+    )
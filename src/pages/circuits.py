@@ -1,32 +1,22 @@
 import streamlit as st
 import pandas as pd
-import requests
 
 import common
+import reference
+import tracing
 common.print_menu()
 
-##############################
-# Data operations
-##############################
-
-@st.cache_data(ttl=300)
-def get_circuits():
-    response = requests.get(f"{st.secrets["api_url"]}/circuits?pageSize=77")
-    if response.status_code == 200:
-        response = response.json()
-        return response
-    return None
-
 ##############################
 # Page content
 ##############################
 
 st.title("🏁 Circuits")
 
-circuits = get_circuits()
+circuits = reference.get_circuits()
 if not circuits:
     st.error("Failed to fetch circuits.")
-df = pd.DataFrame(circuits['records'])
+    st.stop()
+df = pd.DataFrame(circuits)
 
 # High level stats
 col1, col2, col3, col4, col5, col6 = st.columns(6)
@@ -49,14 +39,15 @@ col6.metric("➡️ Mean Altitude", f"{round(df['alt'].mean())} m")
             
 # Display the circuits on a map
 map_df = df[['name', 'lat', 'lng']]
-st.map(
-    map_df,
-    latitude='lat',
-    longitude='lng',
-    use_container_width=True,
-    zoom=1.2,
-    size=(1000)
-)
+with tracing.span("render", "circuit map"):
+    st.map(
+        map_df,
+        latitude='lat',
+        longitude='lng',
+        use_container_width=True,
+        zoom=1.2,
+        size=(1000)
+    )
 
 # Add a table of circuits
 st.write("## 💾 Circuit Data")
@@ -0,0 +1,244 @@
+import re
+import math
+import weakref
+import functools
+import numpy as np
+import pandas as pd
+
+import api
+import cache
+import tracing
+
+# Longest operators first so `>=` isn't read as `>`
+CLAUSE = re.compile(r"^\s*([\w.]+)\s*(>=|<=|!=|=|>|<)\s*(.*?)\s*$")
+COMPARISONS = {
+    "=": np.equal,
+    "!=": np.not_equal,
+    ">": np.greater,
+    "<": np.less,
+    ">=": np.greater_equal,
+    "<=": np.less_equal,
+}
+# Query parameters of the API, with the values it assumes when they are missing
+DEFAULTS = {"page": 1, "pageSize": 10, "filter": "", "sort": "", "order": "asc"}
+
+##############################
+# Table loading
+##############################
+
+@cache.swr(ttl=300)
+def load_table(path):
+    """
+    Returns every record of a paginated endpoint as a flat, column-oriented
+    DataFrame shared by every session. The frame must not be modified.
+    """
+    df = api.get_all(path, normalize=True)
+    for column in df.columns:
+        if df[column].dtype == object and df[column].map(type).isin([str, type(None)]).all():
+            # Sorted categories let filters compare integer codes instead of strings
+            categories = sorted(df[column].dropna().unique())
+            df[column] = pd.Categorical(df[column], categories=categories, ordered=True)
+    return df
+
+##############################
+# API pages
+##############################
+
+# Pages of API queries by canonical query, prefetched ahead of the user paging through them
+_pages = cache.Prefetcher("query page", cache.budget("query_cache_bytes"), ttl=300)
+
+def _fetch_page(path, params):
+    response = api.get(path, params=params)
+    response.raise_for_status()
+    return api.decode(response)
+
+def _page_key(path, params):
+    return path, tuple(params.items())
+
+def get_page(path, params):
+    """
+    Returns a decoded page of a query to a paginated endpoint, `params` holding
+    its page, pageSize and optional filter, sort and order. Pages are cached
+    by canonical query, so equivalent queries share them, and unless it is
+    the last page the next one is prefetched in the background, so paging
+    forward is served from memory. Raises `requests.HTTPError` when the API
+    rejects the query.
+    """
+    params = canonical(params)
+    page = _pages.get(_page_key(path, params))
+    if page is None:
+        page = _fetch_page(path, api_params(params))
+        _pages.put(_page_key(path, params), page)
+    total_pages = api.page_count(page.get("_metadata") or {}, params["pageSize"])
+    if total_pages is None:
+        # Without a page count in the metadata, only a full page may have a next one
+        has_next = len(page["records"]) == params["pageSize"]
+    else:
+        has_next = params["page"] < total_pages
+    if has_next:
+        following = {**params, "page": params["page"] + 1}
+        _pages.prefetch(_page_key(path, following), functools.partial(_fetch_page, path, api_params(following)))
+    return page
+
+##############################
+# Query evaluation
+##############################
+
+def parse_filter(text):
+    """
+    Parses a comma-separated filter query (eg: `year>=2020,circuit.location=Silverstone`)
+    into a list of `(field, operator, value)` clauses. Raises ValueError on invalid clauses.
+    """
+    clauses = []
+    for part in filter(str.strip, (text or "").split(",")):
+        match = CLAUSE.match(part)
+        if not match:
+            raise ValueError(f"Invalid filter clause `{part}`")
+        clauses.append(match.groups())
+    return clauses
+
+def canonical_filter(text):
+    """
+    Returns a filter query in canonical form: clauses without whitespace
+    around their field and operator, sorted, and without duplicates. Invalid
+    queries are only stripped, for the API to report their error.
+    """
+    try:
+        clauses = parse_filter(text)
+    except ValueError:
+        return (text or "").strip()
+    return ",".join(sorted({f"{field}{operator}{value}" for field, operator, value in clauses}))
+
+def canonical(params):
+    """
+    Returns the parameters of a query in canonical form: every parameter of
+    `DEFAULTS` set, in its order, and the filter in canonical form. Equivalent
+    queries have the same canonical form.
+    """
+    params = {**DEFAULTS, **{key: value for key, value in params.items() if value is not None and value != ""}}
+    return {
+        "page": int(params["page"]),
+        "pageSize": int(params["pageSize"]),
+        "filter": canonical_filter(params["filter"]),
+        "sort": params["sort"].strip(),
+        "order": params["order"].strip().lower(),
+    }
+
+def api_params(params):
+    # Empty parameters are left out of the request
+    return {key: value for key, value in params.items() if value != ""}
+
+def _column(df, field):
+    # Fields are matched case-insensitively, like the API does
+    columns = {column.lower(): column for column in df.columns}
+    if field.lower() not in columns:
+        raise ValueError(f"Unknown field `{field}`")
+    return columns[field.lower()]
+
+def _coerce(series, value):
+    if pd.api.types.is_bool_dtype(series):
+        return value.lower() == "true"
+    if pd.api.types.is_numeric_dtype(series):
+        try:
+            return float(value)
+        except ValueError:
+            raise ValueError(f"`{series.name}` expects a number, got `{value}`") from None
+    return value
+
+def _category_mask(series, operator, value):
+    codes = series.cat.codes.to_numpy()
+    categories = series.cat.categories
+    # Missing values have the code -1 and never match
+    present = codes >= 0
+    if operator in ("=", "!="):
+        code = categories.get_indexer([value])[0]
+        matches = (codes == code) & (code >= 0)
+        return matches if operator == "=" else present & ~matches
+    left, right = categories.searchsorted(value, "left"), categories.searchsorted(value, "right")
+    if operator == ">":
+        return codes >= right
+    if operator == ">=":
+        return codes >= left
+    if operator == "<":
+        return present & (codes < left)
+    return present & (codes < right)
+
+def filter_mask(df, clauses):
+    """
+    Returns a boolean mask of the rows matching every clause.
+    """
+    mask = np.ones(len(df), dtype=bool)
+    for field, operator, value in clauses:
+        series = df[_column(df, field)]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            mask &= _category_mask(series, operator, value)
+            continue
+        target = _coerce(series, value)
+        if series.dtype == object:
+            # Missing values never match, strings are compared as strings
+            present = series.notna().to_numpy()
+            values = series.where(series.notna(), "").astype(str).to_numpy()
+            mask &= present & COMPARISONS[operator](values, str(target))
+        else:
+            # Missing values never match, not even `!=`
+            mask &= series.notna().to_numpy() & COMPARISONS[operator](series.to_numpy(), target)
+    return mask
+
+def project(df, columns):
+    """
+    Keeps the requested columns, a nested object name (eg: `race`) keeping all of its fields.
+    """
+    keep = []
+    for name in filter(None, (column.strip() for column in columns.split(","))):
+        matches = [column for column in df.columns if column == name or column.startswith(f"{name}.")]
+        if not matches:
+            raise ValueError(f"Unknown column `{name}`")
+        keep.extend(matches)
+    return df[keep]
+
+# Rows matched by local queries, by table and canonical query
+_selections = cache.LRUCache("local query", cache.budget("query_cache_bytes"), ttl=300)
+
+def select(df, filter_query="", sort="", order="asc"):
+    """
+    Returns the positions of the rows matching `filter_query`, in `sort` order.
+    Results are cached by table and canonical query, and must not be modified.
+    """
+    key = (id(df), canonical_filter(filter_query), sort.strip(), order)
+    entry = _selections.get(key)
+    # The id of a table can be reused once it is freed
+    if entry is not None and entry[0]() is df:
+        return entry[1]
+    positions = _select(df, filter_query, sort.strip(), order)
+    positions.flags.writeable = False
+    _selections.put(key, (weakref.ref(df), positions), size=positions.nbytes)
+    return positions
+
+def _select(df, filter_query, sort, order):
+    clauses = parse_filter(filter_query)
+    positions = np.flatnonzero(filter_mask(df, clauses)) if clauses else np.arange(len(df))
+    if sort:
+        keys = df[_column(df, sort)].take(positions).reset_index(drop=True)
+        order_by = keys.sort_values(ascending=order == "asc", kind="stable", na_position="last").index
+        positions = positions[order_by.to_numpy()]
+    return positions
+
+@tracing.traced("transform", "local query")
+def run(df, filter_query="", sort="", order="asc", page=1, page_size=10, keep_columns=""):
+    """
+    Evaluates a Custom Query form locally against a table from `load_table`,
+    with the same filter syntax, sorting and paging as the API.
+    Returns the `_metadata` and the records of the requested page.
+    """
+    positions = select(df, filter_query, sort, order)
+    total = len(positions)
+    start = (page - 1) * page_size
+    result = project(df, keep_columns) if keep_columns else df
+    result = result.take(positions[start:start + page_size])
+    metadata = {
+        "page": page,
+        "pageSize": page_size,
+        "totalPages": max(1, math.ceil(total / page_size)),
+        "totalCount": total,
+    }
+    return metadata, result
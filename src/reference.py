@@ -0,0 +1,191 @@
+import json
+import time
+import hashlib
+import sqlite3
+
+from contextlib import closing
+from dataclasses import dataclass
+
+import api
+import cache
+import store
+
+# Reference datasets kept on disk, name: (path, query parameters)
+DATASETS = {
+    "circuits": ("/circuits", {}),
+    "drivers": ("/drivers", {"sort": "surname"}),
+}
+
+##############################
+# On-disk store
+##############################
+
+def _connect():
+    connection = store.connect("reference.sqlite3", """
+        CREATE TABLE IF NOT EXISTS reference (
+            name TEXT PRIMARY KEY,
+            body BLOB NOT NULL,
+            sha256 TEXT NOT NULL,
+            etag TEXT,
+            last_modified TEXT,
+            fetched_at REAL NOT NULL
+        )
+    """)
+    connection.row_factory = sqlite3.Row
+    return connection
+
+def _read(name):
+    with closing(_connect()) as connection:
+        return connection.execute("SELECT * FROM reference WHERE name = ?", (name,)).fetchone()
+
+def _write(name, body, sha256, etag, last_modified):
+    with closing(_connect()) as connection, connection:
+        connection.execute(
+            "INSERT OR REPLACE INTO reference VALUES (?, ?, ?, ?, ?, ?)",
+            (name, body, sha256, etag, last_modified, time.time()),
+        )
+
+def _touch(name):
+    with closing(_connect()) as connection, connection:
+        connection.execute("UPDATE reference SET fetched_at = ? WHERE name = ?", (time.time(), name))
+
+##############################
+# Revalidation
+##############################
+
+def _revalidate(name, stored):
+    """
+    Fetches a dataset from the API unless it is unchanged since it was stored.
+
+    The first page is requested conditionally when the API returned an ETag or
+    Last-Modified header, a `304 Not Modified` ending the revalidation there.
+    Otherwise the full dataset is fetched and compared by content hash so the
+    stored copy (and its version) only changes when the data does.
+    """
+    path, params = DATASETS[name]
+    headers = {}
+    if stored and stored["etag"]:
+        headers["If-None-Match"] = stored["etag"]
+    if stored and stored["last_modified"]:
+        headers["If-Modified-Since"] = stored["last_modified"]
+
+    response = api.get(path, params={**params, "page": 1, "pageSize": api.DEFAULT_PAGE_SIZE}, headers=headers)
+    if stored and response.status_code == 304:
+        _touch(name)
+        return stored
+    response.raise_for_status()
+
+    records = api.get_all_records(path, params, first_page=api.decode(response))
+    body = json.dumps(records, separators=(",", ":")).encode()
+    sha256 = hashlib.sha256(body).hexdigest()
+    if stored and stored["sha256"] == sha256:
+        _touch(name)
+        return stored
+    _write(name, body, sha256, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+    return _read(name)
+
+def _load(name):
+    stored = _read(name)
+    max_age = cache.setting("reference_max_age")
+    if stored is None or time.time() - stored["fetched_at"] >= max_age:
+        try:
+            stored = _revalidate(name, stored)
+        except api.RequestException:
+            # Serve the last known copy while the API is unavailable
+            if stored is None:
+                raise
+    return stored
+
+def version(name):
+    """
+    Returns the content hash of a stored dataset, which changes whenever its data does.
+    """
+    return _load(name)["sha256"]
+
+def records(name):
+    """
+    Returns the records of a reference dataset from the on-disk store, shared by
+    every page and worker process. The API is only called once the stored copy
+    is older than `reference_max_age` seconds, and the stored copy is served
+    as is while the API is unavailable.
+    """
+    return json.loads(_load(name)["body"])
+
+##############################
+# Datasets
+##############################
+
+@cache.swr(ttl=300)
+def get_circuits():
+    try:
+        return records("circuits")
+    except api.RequestException:
+        return None
+
+@cache.swr(ttl=300)
+def get_drivers():
+    try:
+        return records("drivers")
+    except api.RequestException:
+        return None
+
+##############################
+# Index
+##############################
+
+def _counts(names):
+    counts = {}
+    for name in names.values():
+        counts[name] = counts.get(name, 0) + 1
+    return counts
+
+@dataclass(frozen=True)
+class ReferenceIndex:
+    """
+    Lookups over the reference datasets, built once per data version and shared
+    by every session. Widgets bind to the prebuilt id lists and display them
+    through the label dicts, so reruns do not rebuild or scan anything.
+    """
+    circuit_ids: list
+    driver_ids: list
+    circuit_names: dict
+    driver_names: dict
+
+    @classmethod
+    def build(cls, circuits, drivers):
+        driver_names = {driver["driverId"]: f"{driver['forename']} {driver['surname']}" for driver in drivers}
+        # Tell apart drivers sharing a name by their year of birth, then by id
+        counts = _counts(driver_names)
+        for driver in drivers:
+            name = driver_names[driver["driverId"]]
+            if counts[name] > 1:
+                born = (driver.get("dob") or "")[:4]
+                driver_names[driver["driverId"]] = f"{name} ({born or driver['driverId']})"
+        counts = _counts(driver_names)
+        driver_names = {driver_id: f"{name} #{driver_id}" if counts[name] > 1 else name for driver_id, name in driver_names.items()}
+
+        circuit_names = {circuit["circuitId"]: circuit["name"] for circuit in circuits}
+        return cls(
+            circuit_ids=sorted(circuit_names, key=circuit_names.get),
+            driver_ids=list(driver_names),
+            circuit_names=circuit_names,
+            driver_names=driver_names,
+        )
+
+@cache.swr(ttl=300)
+def _versions():
+    return version("circuits"), version("drivers")
+
+@cache.swr(ttl=24 * 60 * 60)
+def _index(circuits_version, drivers_version):
+    return ReferenceIndex.build(records("circuits"), records("drivers"))
+
+def index():
+    """
+    Returns the `ReferenceIndex` of the current reference data, or None when
+    the data can't be fetched.
+    """
+    try:
+        return _index(*_versions())
+    except api.RequestException:
+        return None
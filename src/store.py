@@ -0,0 +1,17 @@
+import os
+import sqlite3
+
+import cache
+
+def connect(file_name, schema):
+    """
+    Opens the SQLite store `file_name` in the `cache_dir` directory, shared by
+    every worker process, creating its tables with the `schema` script.
+    """
+    cache_dir = cache.setting("cache_dir")
+    os.makedirs(cache_dir, exist_ok=True)
+    connection = sqlite3.connect(os.path.join(cache_dir, file_name), timeout=30)
+    # WAL lets every worker process read while one of them writes
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.executescript(schema)
+    return connection
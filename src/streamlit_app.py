@@ -1,15 +1,9 @@
 import streamlit as st
-import requests
 
 import common
+import highlights
 common.print_menu()
 
-def get_metrics():
-    response = requests.get(f"{st.secrets["api_url"]}/database/metrics")
-    if response.status_code == 200:
-        return response.json()
-    return None
-
 st.markdown("""
     # 🚗 Vehicle Performance Software - Data Viewer
     This Streamlit powered dashboard contains a comprehensive Data Insights Platform designed to allow users to parse, manipulate, and visualize data.<br>
@@ -29,7 +23,7 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Fetch and display database metrics
-metrics = get_metrics()
+metrics = highlights.get_metrics()
 if metrics:
     columns = st.columns([2, *([3] * len(metrics)), 2]) # Add outer columns for padding
     for col, (table_name, count) in zip(columns[1:-1], metrics.items()):
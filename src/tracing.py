@@ -0,0 +1,188 @@
+import json
+import time
+import threading
+import functools
+import streamlit as st
+
+from collections import deque
+from contextlib import contextmanager
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# Upper bounds, in seconds, of the span duration histogram buckets
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Spans kept per session for the timing panel
+RECENT_SPANS = 500
+
+# Key of a session's recent spans in its session state, dropped with the session
+_RUN_KEY = "_tracing_run"
+
+_lock = threading.Lock()
+_spans = {}
+_caches = {}
+_local = threading.local()
+
+##############################
+# Recording
+##############################
+
+def _session_run():
+    # Background threads borrow the run context of the session that started
+    # them but work for every session, their spans aren't that session's
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is None or is_detached() or _RUN_KEY not in ctx.session_state:
+        return None
+    return ctx.session_state[_RUN_KEY]
+
+def detach():
+    """
+    Leaves the spans of the current thread out of the timing panel of the
+    session whose run context it borrows, for threads serving every session.
+    """
+    _local.detached = True
+
+def is_detached():
+    return getattr(_local, "detached", False)
+
+def record(kind, name, seconds):
+    """
+    Records a finished span of `kind` (api, decode, transform or render).
+    """
+    run = _session_run()
+    with _lock:
+        stats = _spans.get((kind, name))
+        if stats is None:
+            stats = _spans[(kind, name)] = {"count": 0, "sum": 0.0, "max": 0.0, "buckets": [0] * len(BUCKETS)}
+        stats["count"] += 1
+        stats["sum"] += seconds
+        stats["max"] = max(stats["max"], seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                stats["buckets"][i] += 1
+                break
+        if run is not None:
+            run["current"].append({"kind": kind, "name": name, "ms": round(seconds * 1000, 3)})
+
+@contextmanager
+def span(kind, name):
+    """
+    Times the enclosed block as a span.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(kind, name, time.perf_counter() - start)
+
+def traced(kind, name=None):
+    """
+    Decorator timing every call of a function as a span.
+    """
+    def decorator(func):
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(kind, label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def count_cache(function, event):
+    """
+    Counts a cache `event` (hit, stale or miss) of a cached function.
+    """
+    with _lock:
+        counters = _caches.setdefault(function, {"hit": 0, "stale": 0, "miss": 0})
+        counters[event] += 1
+
+##############################
+# Export
+##############################
+
+def snapshot():
+    """
+    Returns the process-wide span statistics and cache counters.
+    """
+    with _lock:
+        spans = [
+            {"kind": kind, "name": name, "count": stats["count"], "total_ms": stats["sum"] * 1000,
+             "mean_ms": stats["sum"] / stats["count"] * 1000, "max_ms": stats["max"] * 1000}
+            for (kind, name), stats in sorted(_spans.items())
+        ]
+        caches = [{"function": function, **counters} for function, counters in sorted(_caches.items())]
+    return {"spans": spans, "caches": caches}
+
+def to_json():
+    return json.dumps(snapshot(), indent=2)
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def to_prometheus():
+    """
+    Returns the span statistics and cache counters in the Prometheus text format.
+    """
+    lines = [
+        "# HELP vps_span_seconds Duration of instrumented dashboard operations.",
+        "# TYPE vps_span_seconds histogram",
+    ]
+    with _lock:
+        for (kind, name), stats in sorted(_spans.items()):
+            labels = f'kind="{_label(kind)}",name="{_label(name)}"'
+            cumulative = 0
+            for bound, count in zip(BUCKETS, stats["buckets"]):
+                cumulative += count
+                lines.append(f'vps_span_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'vps_span_seconds_bucket{{{labels},le="+Inf"}} {stats["count"]}')
+            lines.append(f"vps_span_seconds_sum{{{labels}}} {stats['sum']}")
+            lines.append(f"vps_span_seconds_count{{{labels}}} {stats['count']}")
+        lines += [
+            "# HELP vps_cache_events_total Lookups of cached functions by outcome.",
+            "# TYPE vps_cache_events_total counter",
+        ]
+        for function, counters in sorted(_caches.items()):
+            for event, count in counters.items():
+                lines.append(f'vps_cache_events_total{{function="{_label(function)}",event="{event}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+##############################
+# Timing panel
+##############################
+
+def begin_run():
+    """
+    Starts collecting the spans of the current session's run, making the spans
+    of its previous run available to the timing panel. Returns those spans.
+    """
+    run = st.session_state.get(_RUN_KEY)
+    if run is None:
+        run = st.session_state[_RUN_KEY] = {"current": deque(maxlen=RECENT_SPANS), "previous": []}
+    with _lock:
+        run["previous"], run["current"] = list(run["current"]), deque(maxlen=RECENT_SPANS)
+        return run["previous"]
+
+def end_session():
+    st.session_state.pop(_RUN_KEY, None)
+
+def print_panel(previous_run):
+    """
+    Prints the timing panel in the sidebar: the spans of the previous run, the
+    process-wide statistics and cache counters, with JSON and Prometheus exports.
+    """
+    with st.sidebar.expander("⏱️ Timings", expanded=True):
+        st.caption("Spans of the previous run")
+        if previous_run:
+            st.dataframe(previous_run, hide_index=True, use_container_width=True)
+            st.caption(f"Total: {sum(span['ms'] for span in previous_run):,.1f} ms")
+        else:
+            st.write("No spans recorded yet, interact with the page to see its timings.")
+
+        stats = snapshot()
+        st.caption("All sessions")
+        st.dataframe(stats["spans"], hide_index=True, use_container_width=True)
+        st.caption("Cache lookups")
+        st.dataframe(stats["caches"], hide_index=True, use_container_width=True)
+
+        col1, col2 = st.columns(2)
+        col1.download_button("JSON", to_json(), file_name="timings.json", mime="application/json")
+        col2.download_button("Prometheus", to_prometheus(), file_name="timings.prom", mime="text/plain")
@@ -0,0 +1,126 @@
+import time
+import threading
+import streamlit as st
+
+from datetime import datetime
+
+import cache
+import highlights
+import history
+import reference
+
+# Share of a cached function's TTL after which the warmer refreshes it
+REFRESH_AHEAD = 0.8
+# Refresh interval of the jobs that are not `cache.swr` functions, in seconds
+DEFAULT_INTERVAL = 240
+# Seconds before retrying a job that failed
+RETRY_INTERVAL = 30
+
+def jobs():
+    """
+    Returns the datasets kept warm, name: function. The headline figures, reference
+    datasets and lap time store are needed by the first run of their pages.
+    """
+    return {
+        "Database metrics": highlights.get_metrics,
+        "Next race": highlights.get_next_race,
+        "Most points": highlights.driver_with_most_points,
+        "Most wins": highlights.driver_with_most_wins,
+        "Circuits": reference.get_circuits,
+        "Drivers": reference.get_drivers,
+        "Reference index": reference.index,
+        "Lap times": history.synced,
+    }
+
+##############################
+# Scheduler
+##############################
+
+class Warmer:
+    """
+    Background thread warming the shared caches when the server starts, then
+    refreshing every dataset before its TTL expires so page runs are always
+    served from the cache instead of waiting on the API.
+    """
+
+    def __init__(self, jobs):
+        self._jobs = jobs
+        self._lock = threading.Lock()
+        self._status = {
+            name: {"job": name, "runs": 0, "failures": 0, "last_run": None, "duration_ms": None, "error": None, "next_run": 0.0}
+            for name in jobs
+        }
+        self._stopped = threading.Event()
+        self._thread = cache.background_thread(self._loop, "cache-warmer")
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self, name):
+        func = self._jobs[name]
+        # `cache.swr` functions are recomputed, anything else is simply called
+        refresh = getattr(func, "refresh", func)
+        interval = getattr(func, "ttl", DEFAULT_INTERVAL / REFRESH_AHEAD) * REFRESH_AHEAD
+        start = time.time()
+        try:
+            error = None if refresh() is not None else "No data returned"
+        except Exception as exception:
+            error = f"{type(exception).__name__}: {exception}"
+        with self._lock:
+            status = self._status[name]
+            status["runs"] += 1
+            status["failures"] += error is not None
+            status["last_run"] = start
+            status["duration_ms"] = round((time.time() - start) * 1000, 1)
+            status["error"] = error
+            status["next_run"] = start + (RETRY_INTERVAL if error else interval)
+
+    def _loop(self):
+        while not self._stopped.is_set():
+            now = time.time()
+            for name in [name for name, status in self.status().items() if status["next_run"] <= now]:
+                self._run(name)
+            wait = min(status["next_run"] for status in self.status().values()) - time.time()
+            self._stopped.wait(max(wait, 1))
+
+    def status(self):
+        """
+        Returns a copy of the status of every job, by name.
+        """
+        with self._lock:
+            return {name: dict(status) for name, status in self._status.items()}
+
+@st.cache_resource(show_spinner=False)
+def start():
+    """
+    Starts the cache warmer once per server process, unless `warm_caches` is
+    disabled. Returns it, or None when disabled.
+    """
+    if not cache.setting("warm_caches"):
+        return None
+    return Warmer(jobs()).start()
+
+##############################
+# Status panel
+##############################
+
+def _time(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime("%H:%M:%S") if timestamp else None
+
+def print_status(warmer):
+    """
+    Prints the status of the cache warmer jobs in the sidebar.
+    """
+    with st.sidebar.expander("🔥 Cache warmer", expanded=False):
+        if warmer is None:
+            st.write("Disabled, datasets are fetched by the first page run that needs them.")
+            return
+        rows = [
+            {**status, "last_run": _time(status["last_run"]), "next_run": _time(status["next_run"])}
+            for status in warmer.status().values()
+        ]
+        st.dataframe(rows, hide_index=True, use_container_width=True)